@@ -1,7 +1,14 @@
-import os
+import asyncio
 import logging
-from dotenv import load_dotenv
-import requests
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from json_extract import extract_json
+from metadata_cache import normalize_topic
+from metadata_models import ArchiveClassification
+from local_archive_classifier import LocalArchiveClassifier, get_local_archive_classifier
+from model_router import DEFAULT_MODEL, ModelRouter, get_model_router
+from openrouter_client import OpenRouterClient, estimate_tokens, get_openrouter_client, supports_json_mode
+from prompts import ARCHIVES, ARCHIVE_CLASSIFICATION
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,79 +17,179 @@ logging.basicConfig(
 )
 logger = logging.getLogger("OpenRouterMetadataWorkflow")
 
+CLASSIFIER_MODES = ("llm", "local", "hybrid")
+
 
 class ArchiveClassifier:
-    def __init__(self, model: str = "perplexity/sonar"):
-        load_dotenv()
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
-            logger.error("OPENROUTER_API_KEY not found in environment variables.")
-            raise EnvironmentError("Missing OpenRouter API key.")
-
-        self.api_key = api_key
-        self.model = model
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
-        logger.info("OpenRouter client initialized.")
-
-    def build_query(self, topics_list_str: str) -> str:
-        logger.debug(f"Building query for topic: {topics_list_str}")
-        return f"""
-            You are a scientific research assistant. Classify each of the following topics into one of:
-            arXiv, PubMed, bioRxiv, ChemRxiv.
-
-            - arXiv: Physics, mathematics, computer science, quantitative biology, quantitative finance, statistics, electrical engineering and systems science, and economics
-            - PubMed: Biomedicine and health, with related fields in the life sciences, behavioral sciences, chemical sciences, and bioengineering.
-            - bioRxiv: Biochemistry, Bioinformatics, Biophysics, Cancer Biology, Cell Biology, Developmental Biology, Ecology, Evolutionary Biology, Genetics, Genomics, Immunology, Microbiology, Molecular Biology, Neuroscience, Paleontology, Pathology, Pharmacology and Toxicology, Physiology, Plant Biology, Scientific Communication and Education, Synthetic Biology, Systems Biology, and Zoology.
-            - ChemRxiv: Agricultural and Food Chemistry, Analytical Chemistry, Biological and Mecidinal Chemistry, Catalysis, Chemical Education, Chemical Engineering and Industrial Chemistry, Earth Chemistry, Space Chemistry, Environmental Chemistry, Energy, Inorganic Chemistry, Materials Chemistry, Nanoscience and Nanotechnology, Organic Chemistry, Organometallic Chemistry, Physical Chemistry, Polymer Chemistry, Theoretical and Computational Chemistry.
-
-            Topics:
-            {topics_list_str}
-
-            Return ONLY a valid JSON object where:
-            - Each key is the topic exactly as given
-            - Each value is one of: arXiv, PubMed, bioRxiv, ChemRxiv
-
-            Example:
-            {{
-                "graph neural networks for traffic prediction": "arXiv",
-                "randomized controlled trial of a new antihypertensive drug": "PubMed"
-            }}
-            """
-
-    def run(self, topic: str):
-        query = self.build_query(topic)
-        logger.info(f"Sending query for topic: {topic}")
+    """
+    Classify lists of topics into ARCHIVES.
+
+    Large lists are de-duplicated, split into chunks that fit `chunk_tokens`
+    of topic text (and leave room for the answer within `max_tokens`), and the
+    chunks are sent concurrently with at most `max_workers` in flight.
+
+    `mode` picks who answers: "llm" sends every topic to OpenRouter, "local"
+    only uses the in-process LocalArchiveClassifier, and "hybrid" answers
+    confident topics locally and sends the ambiguous rest to OpenRouter.
+    """
+
+    def __init__(
+        self,
+        model: str | None = None,
+        client: OpenRouterClient | None = None,
+        router: ModelRouter | None = None,
+        chunk_tokens: int = 400,
+        max_workers: int = 4,
+        max_tokens: int = 2000,
+        mode: str = "hybrid",
+        local_classifier: LocalArchiveClassifier | None = None,
+    ):
+        if mode not in CLASSIFIER_MODES:
+            raise ValueError(f"Unknown classifier mode {mode!r}; expected one of {CLASSIFIER_MODES}.")
+
+        self.mode = mode
+        self.local_classifier = local_classifier
+        if mode != "llm" and local_classifier is None:
+            self.local_classifier = get_local_archive_classifier()
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.max_tokens = max_tokens
+        # Naming a model or client pins the classifier to it; otherwise calls go through the shared router.
+        if router is None and (model or client):
+            router = ModelRouter.single(client or get_openrouter_client(), model or DEFAULT_MODEL)
+        self.router = router or get_model_router()
+
+    def build_messages(self, topics: list[str], model: str) -> list[dict]:
+        logger.debug(f"Building messages for topics: {topics}")
+        return ARCHIVE_CLASSIFICATION.messages(model, topics="\n".join(f"- {topic}" for topic in topics))
 
+    def build_payload(self, topics: list[str], model: str) -> dict:
         payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": query
-                }
-            ],
+            "model": model,
+            "messages": self.build_messages(topics, model),
             "temperature": 0.7,
-            "max_tokens": 2000
+            "max_tokens": self.max_tokens
         }
+        if supports_json_mode(model):
+            payload["response_format"] = ArchiveClassification.response_format()
+        return payload
 
-        try:
-            response = requests.post(
-                self.api_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=payload
-            )
-
-            if response.status_code != 200:
-                logger.error("API Error %d: %s", response.status_code, response.text)
-                return ""
-
-            result = response.json()
-            logger.info("Query completed successfully.")
-            return result["choices"][0]["message"]["content"]
+    @staticmethod
+    def dedupe(topics: list[str] | str) -> dict[str, list[str]]:
+        """Map each normalized topic to the original spellings that produced it."""
+        if isinstance(topics, str):
+            topics = topics.split(",")
+
+        groups: dict[str, list[str]] = {}
+        for topic in topics:
+            topic = topic.strip()
+            if topic:
+                groups.setdefault(normalize_topic(topic), []).append(topic)
+        return groups
+
+    def chunk(self, topics: list[str]) -> list[list[str]]:
+        """Split topics so each chunk's prompt text and expected answer stay within budget."""
+        # Every topic is echoed back as a JSON key plus an archive name.
+        answer_budget = int(self.max_tokens * 0.8)
+        chunks, current, prompt_tokens, answer_tokens = [], [], 0, 0
+        for topic in topics:
+            cost = estimate_tokens(topic)
+            if current and (
+                prompt_tokens + cost > self.chunk_tokens or answer_tokens + cost + 8 > answer_budget
+            ):
+                chunks.append(current)
+                current, prompt_tokens, answer_tokens = [], 0, 0
+            current.append(topic)
+            prompt_tokens += cost
+            answer_tokens += cost + 8
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def parse_chunk(content: str, topics: list[str]) -> dict[str, str]:
+        """Match the model's JSON answer back to the requested topics (keyed by normalized topic), dropping invalid archives."""
+        if not content:
+            return {}
+        answer = extract_json(content, dict)
+
+        archives = {archive.lower(): archive for archive in ARCHIVES}
+        by_topic = {normalize_topic(k): archives.get(str(v).strip().lower()) for k, v in answer.items()}
+        matched = {}
+        for topic in topics:
+            archive = by_topic.get(normalize_topic(topic))
+            if archive:
+                matched[normalize_topic(topic)] = archive
+        return matched
+
+    def _classify_locally(self, groups: dict[str, list[str]]) -> tuple[dict[str, str], list[str]]:
+        """Answer what the local index can; return (normalized topic -> archive, topics left for the model)."""
+        if self.mode == "llm":
+            return {}, [originals[0] for originals in groups.values()]
 
+        normalized = list(groups)
+        answers = self.local_classifier.classify_many(normalized)
+        local, pending = {}, []
+        for topic, (archive, confidence) in zip(normalized, answers):
+            if archive and (self.mode == "local" or self.local_classifier.is_confident(confidence)):
+                local[topic] = archive
+            elif self.mode == "hybrid":
+                pending.append(groups[topic][0])
+
+        logger.info("Local classifier answered %d of %d topics.", len(local), len(groups))
+        return local, pending
+
+    def _merge(self, groups: dict[str, list[str]], results: list[dict[str, str]]) -> ArchiveClassification:
+        classified = {}
+        for result in results:
+            classified.update(result)
+
+        archives, failed = {}, []
+        for normalized, originals in groups.items():
+            for original in originals:
+                if normalized in classified:
+                    archives[original] = classified[normalized]
+                else:
+                    failed.append(original)
+
+        logger.info("Classified %d topics (%d failed).", len(archives), len(failed))
+        return ArchiveClassification(archives=archives, failed=failed)
+
+    def _classify_chunk(self, topics: list[str]) -> dict[str, str]:
+        try:
+            content = self.router.complete(lambda model: self.build_payload(topics, model))
+            with metrics.stage("parse"):
+                return self.parse_chunk(content, topics)
         except Exception as e:
-            logger.error(f"Failed to query OpenRouter: {e}")
-            raise
+            logger.error(f"Failed to classify chunk of {len(topics)} topics: {e}")
+            return {}
+
+    async def _aclassify_chunk(self, topics: list[str], semaphore: asyncio.Semaphore) -> dict[str, str]:
+        async with semaphore:
+            try:
+                content = await self.router.acomplete(lambda model: self.build_payload(topics, model))
+                with metrics.stage("parse"):
+                    return self.parse_chunk(content, topics)
+            except Exception as e:
+                logger.error(f"Failed to classify chunk of {len(topics)} topics: {e}")
+                return {}
+
+    def run(self, topics: list[str] | str) -> ArchiveClassification:
+        groups = self.dedupe(topics)
+        local, pending = self._classify_locally(groups)
+        chunks = self.chunk(pending)
+        logger.info(f"Sending {len(pending)} unique topics in {len(chunks)} chunks.")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._classify_chunk, chunks))
+        return self._merge(groups, [local, *results])
+
+    async def arun(self, topics: list[str] | str) -> ArchiveClassification:
+        groups = self.dedupe(topics)
+        local, pending = self._classify_locally(groups)
+        chunks = self.chunk(pending)
+        logger.info(f"Sending {len(pending)} unique topics in {len(chunks)} chunks.")
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+        results = await asyncio.gather(*(self._aclassify_chunk(chunk, semaphore) for chunk in chunks))
+        return self._merge(groups, [local, *results])
@@ -0,0 +1,144 @@
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+Answers every request with a schema-shaped JSON object after a latency drawn
+from a configurable distribution, optionally failing a fraction of requests
+with 429/5xx, and streams the answer as SSE chunks when asked to. Point the
+server at it with OPENROUTER_API_URL=http://127.0.0.1:<port>/api/v1/chat/completions.
+
+    python benchmarks/fake_openrouter.py --port 8900 --latency lognormal:0.8,0.5 --error-rate 0.02
+
+Latency specs: "fixed:S", "uniform:LO,HI", "lognormal:MEDIAN,SIGMA" (seconds).
+GET /stats returns request, error and stream counters.
+"""
+import json
+import math
+import random
+import asyncio
+import argparse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+ERROR_STATUSES = (429, 500, 502, 503)
+
+
+class LatencyDistribution:
+    """Seconds to wait before answering, sampled per request."""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        if kind == "fixed" and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda: random.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            self._sample = lambda: random.lognormvariate(math.log(values[0]), values[1])
+        else:
+            raise ValueError(f"Bad latency spec {spec!r}; use fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA.")
+
+    def sample(self) -> float:
+        return max(0.0, self._sample())
+
+
+def fake_answer(payload: dict) -> dict:
+    """An answer matching the request's response_format schema, or the topics listed in the user message."""
+    user = next((m["content"] for m in reversed(payload.get("messages", [])) if m.get("role") == "user"), "")
+    if isinstance(user, str) and user.startswith("Topics:"):
+        topics = [line[2:] for line in user.splitlines()[1:] if line.startswith("- ")]
+        return {topic: random.choice(("arXiv", "PubMed", "bioRxiv", "ChemRxiv")) for topic in topics}
+
+    schema = (payload.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+    properties = schema.get("properties") or {"archive": {"type": "string"}, "context": {"type": "string"}}
+    return {
+        name: ["lorem ipsum", "dolor sit amet"] if spec.get("type") == "array" else f"fake {name}"
+        for name, spec in properties.items()
+    }
+
+
+class FakeOpenRouter:
+    def __init__(self, latency: LatencyDistribution, error_rate: float = 0.0, chunk_chars: int = 24,
+                 chunk_interval: float = 0.01):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval
+        self.stats = {"requests": 0, "errors": 0, "streams": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def _usage(self, payload: dict, content: str) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content) // 4 + 1,
+            "prompt_tokens_details": {"cached_tokens": prompt_tokens // 2},
+        }
+
+    async def completions(self, request: Request):
+        payload = await request.json()
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            delay = self.latency.sample()
+            if random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                await asyncio.sleep(delay / 4)
+                status = random.choice(ERROR_STATUSES)
+                headers = {"Retry-After": "1"} if status == 429 else None
+                return JSONResponse({"error": {"code": status, "message": "fake upstream error"}}, status, headers)
+
+            content = json.dumps(fake_answer(payload))
+            if not payload.get("stream"):
+                await asyncio.sleep(delay)
+                return JSONResponse({
+                    "model": payload.get("model"),
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": self._usage(payload, content),
+                })
+
+            self.stats["streams"] += 1
+            # Time to first byte is most of the latency; the rest of the answer trickles out in chunks.
+            await asyncio.sleep(delay)
+            return StreamingResponse(self._sse(payload, content), media_type="text/event-stream")
+        finally:
+            self.stats["in_flight"] -= 1
+
+    async def _sse(self, payload: dict, content: str):
+        for i in range(0, len(content), self.chunk_chars):
+            chunk = {"choices": [{"delta": {"content": content[i:i + self.chunk_chars]}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(self.chunk_interval)
+        yield f"data: {json.dumps({'choices': [], 'usage': self._usage(payload, content)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def get_stats(self, request: Request):
+        return JSONResponse(self.stats)
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/api/v1/chat/completions", self.completions, methods=["POST"]),
+            Route("/stats", self.get_stats, methods=["GET"]),
+        ])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=24)
+    parser.add_argument("--chunk-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    fake = FakeOpenRouter(LatencyDistribution(args.latency), args.error_rate, args.chunk_chars, args.chunk_interval)
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
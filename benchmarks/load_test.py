@@ -0,0 +1,288 @@
+"""
+Offline load test for mcp_server.app.
+
+Starts benchmarks/fake_openrouter.py in a subprocess, serves mcp_server.app
+with uvicorn in a background thread of this process (so its event loop can be
+watched for lag), and drives it over streamable HTTP with `--concurrency`
+MCP client sessions until `--requests` tool calls have completed. Reports
+req/s and p50/p95/p99 latency per tool plus event-loop lag, and writes the
+report as JSON. With --baseline, exits non-zero when throughput drops or a
+tool's p95 grows by more than --max-regression compared with an earlier report.
+
+    python benchmarks/load_test.py --tools get_metadata_v2,get_archive_classifier \\
+        --concurrency 32 --requests 500 --latency lognormal:0.5,0.4 --error-rate 0.02 \\
+        --output bench.json --baseline previous.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+API_KEY = "bench-key"
+
+TOOL_ARGUMENTS = {
+    "get_metadata": lambda topic, stream: {"search_query": topic, "stream": stream},
+    "get_metadata_v2": lambda topic, stream: {"search_query": topic, "stream": stream},
+    "get_metadata_batch": lambda topic, stream: {"topics": [f"{topic} part {i}" for i in range(5)]},
+    "get_archive_classifier": lambda topic, stream: {"topics_str": f"{topic}, {topic} in mice, {topic} catalysis"},
+    "submit_metadata_job": lambda topic, stream: {"search_query": topic},
+    "get_cache_stats": lambda topic, stream: {},
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None,
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+class LoopLagMonitor:
+    """Samples how late a `sleep(interval)` wakes up on the loop it runs in."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def summary(self) -> dict:
+        return {"interval": self.interval, "samples": len(self.samples), **summarize(self.samples)}
+
+
+class ServerThread(threading.Thread):
+    """Runs mcp_server.app under uvicorn, with a LoopLagMonitor on the same event loop."""
+
+    def __init__(self, app, port: int):
+        super().__init__(daemon=True)
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.lag = LoopLagMonitor()
+
+    def run(self):
+        async def serve():
+            monitor = asyncio.create_task(self.lag.run())
+            try:
+                await self.server.serve()
+            finally:
+                monitor.cancel()
+
+        asyncio.run(serve())
+
+    def wait_started(self, timeout: float = 15.0):
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.is_alive():
+                raise RuntimeError("MCP server did not start.")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+def start_fake_upstream(port: int, args) -> subprocess.Popen:
+    import httpx
+
+    process = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "fake_openrouter.py"),
+        "--port", str(port), "--latency", args.latency, "--error-rate", str(args.error_rate),
+        "--chunk-chars", str(args.chunk_chars), "--chunk-interval", str(args.chunk_interval),
+    ])
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake OpenRouter server did not start.")
+
+
+async def drive(url: str, args) -> tuple[dict[str, list[float]], dict[str, dict], float]:
+    """Run `args.requests` tool calls over `args.concurrency` sessions; return latencies, error counts, wall time."""
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    tools = args.tools.split(",")
+    latencies: dict[str, list[float]] = {tool: [] for tool in tools}
+    errors: dict[str, dict] = {tool: {} for tool in tools}
+    counter = iter(range(args.requests))
+
+    async def ignore(*_):
+        pass
+
+    async def worker(worker_id: int):
+        transport = StreamableHttpTransport(url, headers={"Authorization": f"Bearer {API_KEY}"})
+        async with Client(transport, timeout=args.timeout, log_handler=ignore, progress_handler=ignore) as client:
+            for i in counter:
+                tool = tools[i % len(tools)]
+                topic = f"bench topic {i % args.distinct_topics if args.distinct_topics else i}"
+                started = time.perf_counter()
+                try:
+                    result = await client.call_tool(tool, TOOL_ARGUMENTS[tool](topic, args.stream), raise_on_error=False)
+                    error = "tool_error" if result.is_error else None
+                except Exception as e:
+                    error = type(e).__name__
+                if error:
+                    errors[tool][error] = errors[tool].get(error, 0) + 1
+                else:
+                    latencies[tool].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Human-readable regressions of `report` against `baseline`."""
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        regressions.append(f"throughput {baseline['throughput_rps']:.1f} -> {report['throughput_rps']:.1f} req/s")
+    for tool, stats in report["tools"].items():
+        before = baseline.get("tools", {}).get(tool, {}).get("latency", {}).get("p95")
+        after = stats["latency"]["p95"]
+        if before and after and after > before * (1 + max_regression):
+            regressions.append(f"{tool} p95 {before * 1000:.0f}ms -> {after * 1000:.0f}ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", default="get_metadata_v2,get_metadata,get_archive_classifier")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True,
+                        help="ask get_metadata* to stream fields as progress notifications")
+    parser.add_argument("--distinct-topics", type=int, default=0,
+                        help="cycle through this many topics so the cache and coalescing get hits (0 = all unique)")
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="fake upstream latency spec")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake upstream requests that fail")
+    parser.add_argument("--chunk-chars", type=int, default=24)
+    parser.add_argument("--chunk-interval", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-call client timeout")
+    parser.add_argument("--label", default="", help="free-form label stored in the report")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    upstream_port, server_port = free_port(), free_port()
+    # Must be set before the server modules read their settings.
+    os.environ.update({
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_API_URL": f"http://127.0.0.1:{upstream_port}/api/v1/chat/completions",
+        "MCP_API_KEY": API_KEY,
+        "MCP_API_KEYS": "",
+        "MCP_RATE_LIMIT": "0",
+        "METADATA_CACHE_PATH": "",
+        "METADATA_PROVIDERS": "openrouter",
+        "MODEL_BACKENDS": "",
+    })
+
+    upstream = start_fake_upstream(upstream_port, args)
+    try:
+        import mcp_server
+
+        logging.getLogger().setLevel(args.log_level)
+        server = ServerThread(mcp_server.app, server_port)
+        server.start()
+        server.wait_started()
+        try:
+            latencies, errors, wall = asyncio.run(drive(f"http://127.0.0.1:{server_port}/nmj-mcp/", args))
+        finally:
+            server.stop()
+
+        import httpx
+        upstream_stats = httpx.get(f"http://127.0.0.1:{upstream_port}/stats").json()
+    finally:
+        upstream.terminate()
+        upstream.wait(timeout=10)
+
+    completed = sum(len(values) for values in latencies.values())
+    report = {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "wall_seconds": round(wall, 3),
+        "requests": args.requests,
+        "completed": completed,
+        "errors": sum(sum(e.values()) for e in errors.values()),
+        "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+        "tools": {
+            tool: {
+                "completed": len(latencies[tool]),
+                "errors": errors[tool],
+                "rps": round(len(latencies[tool]) / wall, 2) if wall else 0.0,
+                "latency": summarize(latencies[tool]),
+            }
+            for tool in latencies
+        },
+        "event_loop_lag": server.lag.summary(),
+        "upstream": upstream_stats,
+        "server": {"cache": mcp_server.get_metadata_cache().stats(), "coalescing": mcp_server.metadata_flights.stats()},
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    print(f"{completed}/{args.requests} calls in {wall:.2f}s ({report['throughput_rps']} req/s), "
+          f"event-loop lag p99 {report['event_loop_lag']['p99'] * 1000:.1f}ms", file=sys.stderr)
+    for tool, stats in report["tools"].items():
+        lat = stats["latency"]
+        if lat["p50"] is not None:
+            print(f"  {tool:24s} n={stats['completed']:<5d} p50 {lat['p50'] * 1000:7.0f}ms  "
+                  f"p95 {lat['p95'] * 1000:7.0f}ms  p99 {lat['p99'] * 1000:7.0f}ms  errors {stats['errors']}",
+                  file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
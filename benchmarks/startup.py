@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark for mcp_server.
+
+Imports the server in fresh interpreters and reports the wall time of
+`import mcp_server`, plus any heavy modules that were loaded eagerly even
+though they should only load on first use. Exits non-zero when the median
+import time exceeds --max-seconds or a lazy module was imported, so it can
+guard CI against startup regressions.
+
+    python benchmarks/startup.py --runs 10 --max-seconds 1.5 --json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported until a tool actually needs them.
+LAZY_MODULES = (
+    "perplexipy",
+    "openai",
+    "numpy",
+    "fastapi",
+    "local_archive_classifier",
+    "archive_classifier",
+    "metadata_workflow",
+    "openrouter_metadata_workflow",
+    "openrouter_metadata_workflow_v2",
+    "perplexity_metadata_workflow",
+)
+
+CHILD = f"""
+import sys, time, json
+started = time.perf_counter()
+import mcp_server
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "eager": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure(runs: int) -> dict:
+    samples, eager = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        eager.update(result["eager"])
+
+    ordered = sorted(samples)
+    return {
+        "runs": runs,
+        "min": round(ordered[0], 4),
+        "median": round(statistics.median(ordered), 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        "max": round(ordered[-1], 4),
+        "eager_modules": sorted(eager),
+    }
+
+
+def import_profile(top: int) -> list[tuple[str, float]]:
+    """Cumulative import time of the slowest modules, from `python -X importtime`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import mcp_server"], cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.5, help="fail when the median exceeds this")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+    report["max_seconds"] = args.max_seconds
+    report["slowest_imports"] = import_profile(args.top)
+    report["ok"] = report["median"] <= args.max_seconds and not report["eager_modules"]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import mcp_server over {report['runs']} runs: min {report['min']:.3f}s, "
+              f"median {report['median']:.3f}s, p95 {report['p95']:.3f}s (budget {args.max_seconds:.3f}s)")
+        for name, seconds in report["slowest_imports"]:
+            print(f"  {seconds:8.3f}s  {name}")
+        if report["eager_modules"]:
+            print(f"Imported eagerly (should be lazy): {', '.join(report['eager_modules'])}")
+        print("OK" if report["ok"] else "FAIL")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import os
+import threading
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+
+def _list(value: str) -> tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Every environment setting the server and workflows use, read once from the process environment and .env."""
+
+    openrouter_api_key: str | None
+    openrouter_api_url: str
+    openrouter_max_connections: int
+    openrouter_max_keepalive: int
+    openrouter_deadline: float
+    openrouter_attempt_timeout: float
+    openrouter_max_attempts: int
+    openrouter_hedge_model: str | None
+    openrouter_json_mode_models: tuple[str, ...]
+
+    perplexity_api_key: str | None
+    perplexity_api_url: str
+    metadata_providers: tuple[str, ...]
+
+    model_backends: str | None
+    router_max_fallbacks: int
+    router_ewma_alpha: float
+    router_probe_interval: float
+
+    metadata_cache_size: int
+    metadata_cache_ttl: float
+    metadata_cache_path: str | None
+    local_classifier_threshold: float
+    metadata_archive_hint: bool
+
+    mcp_api_key: str | None
+    mcp_api_keys: tuple[str, ...]
+    mcp_rate_limit: float
+    mcp_rate_burst: int
+    metadata_batch_concurrency: int
+    metadata_batch_tpm: float
+
+    job_workers: int
+    job_max_queue: int
+    job_store_path: str | None
+    job_result_ttl: float
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        env = os.getenv
+        return cls(
+            openrouter_api_key=env("OPENROUTER_API_KEY") or None,
+            openrouter_api_url=env("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions"),
+            openrouter_max_connections=int(env("OPENROUTER_MAX_CONNECTIONS", "20")),
+            openrouter_max_keepalive=int(env("OPENROUTER_MAX_KEEPALIVE", "10")),
+            openrouter_deadline=float(env("OPENROUTER_DEADLINE", "90")),
+            openrouter_attempt_timeout=float(env("OPENROUTER_ATTEMPT_TIMEOUT", "45")),
+            openrouter_max_attempts=int(env("OPENROUTER_MAX_ATTEMPTS", "3")),
+            openrouter_hedge_model=env("OPENROUTER_HEDGE_MODEL") or None,
+            openrouter_json_mode_models=_list(
+                env("OPENROUTER_JSON_MODE_MODELS", "perplexity/,openai/,google/,mistralai/,fireworks/")
+            ),
+            perplexity_api_key=env("PERPLEXITY_API_KEY") or None,
+            perplexity_api_url=env("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions"),
+            # Optional metadata providers to expose as tools; "openrouter" is always available.
+            metadata_providers=_list(env("METADATA_PROVIDERS", "openrouter")),
+            # JSON list of router backends; see model_router.build_router().
+            model_backends=env("MODEL_BACKENDS") or None,
+            router_max_fallbacks=int(env("ROUTER_MAX_FALLBACKS", "2")),
+            router_ewma_alpha=float(env("ROUTER_EWMA_ALPHA", "0.2")),
+            router_probe_interval=float(env("ROUTER_PROBE_INTERVAL", "30")),
+            metadata_cache_size=int(env("METADATA_CACHE_SIZE", "1024")),
+            metadata_cache_ttl=float(env("METADATA_CACHE_TTL", "86400")),
+            metadata_cache_path=env("METADATA_CACHE_PATH") or None,
+            local_classifier_threshold=float(env("LOCAL_CLASSIFIER_THRESHOLD", "0.6")),
+            # Let the local classifier pre-answer the archive question in metadata prompts (off by default).
+            metadata_archive_hint=env("METADATA_ARCHIVE_HINT", "false").strip().lower() in ("1", "true", "yes", "on"),
+            mcp_api_key=env("MCP_API_KEY") or None,
+            mcp_api_keys=_list(env("MCP_API_KEYS", "")),
+            mcp_rate_limit=float(env("MCP_RATE_LIMIT", "0")),
+            mcp_rate_burst=int(env("MCP_RATE_BURST", "20")),
+            metadata_batch_concurrency=int(env("METADATA_BATCH_CONCURRENCY", "8")),
+            metadata_batch_tpm=float(env("METADATA_BATCH_TPM", "0")),
+            job_workers=int(env("JOB_WORKERS", "4")),
+            job_max_queue=int(env("JOB_MAX_QUEUE", "100")),
+            job_store_path=env("JOB_STORE_PATH") or None,
+            job_result_ttl=float(env("JOB_RESULT_TTL", "3600")),
+        )
+
+
+_settings: Settings | None = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Return the process-wide Settings, loading .env and the environment on first call only."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def reset_settings():
+    """Forget the loaded settings so the next get_settings() re-reads the environment (for tests and scripts)."""
+    global _settings
+    with _settings_lock:
+        _settings = None
@@ -0,0 +1,95 @@
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("JSONExtract")
+
+
+def loads(text: str):
+    """Parse JSON with orjson when it is installed, falling back to the standard library."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _scan(text: str, start: int) -> str:
+    """
+    Copy the JSON value opening at `text[start]` up to its matching closing
+    bracket, dropping trailing commas before `}`/`]`. Raises ValueError when
+    the text ends before the value is closed.
+    """
+    out = []
+    depth = 0
+    in_string = False
+    escape = False
+    end = len(text)
+    i = start
+    while i < end:
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == ",":
+            j = i + 1
+            while j < end and text[j] in " \t\r\n":
+                j += 1
+            if j >= end or text[j] not in "}]":
+                out.append(char)
+        elif char in "{[":
+            depth += 1
+            out.append(char)
+        elif char in "}]":
+            depth -= 1
+            out.append(char)
+            if depth == 0:
+                return "".join(out)
+        else:
+            out.append(char)
+        i += 1
+    raise ValueError("Model output ended before the JSON object was closed.")
+
+
+def extract_json(text: str, kind: type | None = None):
+    """
+    Pull the first JSON value (of type `kind`, e.g. dict, when given) out of a model answer and parse it.
+
+    Skips any prose or ```json fence before the value, drops trailing commas
+    before `}`/`]`, and stops at the matching closing bracket so trailing
+    commentary is ignored. Bracketed text that is not JSON, or not of the
+    requested kind (a citation marker like "[1]" before the object), is
+    skipped and the scan carries on. Raises ValueError when no complete
+    JSON value can be recovered.
+    """
+    error = ValueError("No JSON object found in model output.")
+    start = 0
+    while True:
+        start = min((i for i in (text.find("{", start), text.find("[", start)) if i != -1), default=-1)
+        if start == -1:
+            raise error
+        try:
+            value = loads(_scan(text, start))
+        except ValueError as e:
+            # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors.
+            error = e
+        else:
+            if kind is None or isinstance(value, kind):
+                return value
+            error = ValueError(f"Expected a JSON {kind.__name__} in model output, got {type(value).__name__}.")
+        start += 1
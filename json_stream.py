@@ -0,0 +1,100 @@
+import json
+import logging
+from json_extract import extract_json
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("IncrementalJSONParser")
+
+
+class IncrementalJSONParser:
+    """
+    Emit the top-level fields of a streamed JSON object as soon as each one is complete.
+
+    Feed it text deltas as they arrive; `feed()` returns the `(key, value)`
+    pairs whose values were closed by that delta. Anything before the first
+    `{` (such as a ```json fence) is ignored, and each character is scanned
+    only once.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: int | None = None
+        self._key: str | None = None
+        self._value_start: int | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> list[tuple[str, object]]:
+        fields = []
+        self._buffer += text
+        while self._position < len(self._buffer) and not self._finished:
+            field = self._step(self._buffer[self._position], self._position)
+            if field is not None:
+                fields.append(field)
+            self._position += 1
+        return fields
+
+    def _step(self, char: str, i: int) -> tuple[str, object] | None:
+        if not self._started:
+            if char == "{":
+                self._started = True
+                self._depth = 1
+            return None
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._key = json.loads(self._buffer[self._key_start:i + 1])
+                    self._key_start = None
+            return None
+
+        if char == '"':
+            self._in_string = True
+            if self._depth == 1 and self._key is None:
+                self._key_start = i
+        elif self._depth == 1 and char == ":" and self._key is not None and self._value_start is None:
+            self._value_start = i + 1
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finished = True
+                return self._close_value(i)
+        elif char == "," and self._depth == 1:
+            return self._close_value(i)
+        return None
+
+    def _close_value(self, end: int) -> tuple[str, object] | None:
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        if key is None or start is None:
+            return None
+
+        raw = self._buffer[start:end].strip()
+        if not raw:
+            return None
+        try:
+            # extract_json drops trailing commas inside nested objects and arrays.
+            return key, extract_json(raw) if raw[0] in "{[" else json.loads(raw)
+        except ValueError:
+            logger.debug("Field %s is not valid JSON; emitting raw text.", key)
+            return key, raw.strip('"')
@@ -0,0 +1,148 @@
+import re
+import math
+import logging
+import threading
+import numpy as np
+from config import get_settings
+from prompts import ARCHIVES, ARCHIVE_DEFINITIONS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("LocalArchiveClassifier")
+
+# Common topic vocabulary that the subject-area names alone do not cover.
+ARCHIVE_KEYWORDS = {
+    "arXiv": "algorithm, machine learning, deep learning, neural network, graph neural network, reinforcement learning, "
+             "computer vision, natural language processing, language model, transformer, optimization, cryptography, "
+             "quantum computing, quantum, particle, cosmology, galaxy, astrophysics, theorem, topology, "
+             "signal processing, robotics, control theory, econometrics, stochastic, probability",
+    "PubMed": "clinical trial, randomized controlled trial, patient, patients, disease, therapy, treatment, diagnosis, "
+              "hospital, cohort, drug, surgery, epidemiology, public health, nursing, vaccine, mental health, "
+              "antihypertensive, diabetes, cardiovascular, prognosis, dementia, obesity, medicine, medical",
+    "bioRxiv": "protein, gene, gene expression, cell, crispr, sequencing, single-cell, rna, dna, mouse, neuron, "
+               "organism, species, transcriptomics, proteomics, evolution, mutation, enzyme, microbiome, "
+               "bacteria, virus, tissue, chromatin, zebrafish, drosophila",
+    "ChemRxiv": "synthesis, catalyst, molecule, molecular, reaction, polymerization, spectroscopy, electrochemistry, "
+                "battery, crystal, solvent, ligand, density functional theory, nanoparticle, alloy, oxidation, "
+                "reduction, perovskite, photocatalysis, medicinal chemistry, metal-organic framework",
+}
+
+_STOPWORDS = {"and", "or", "of", "the", "a", "an", "in", "on", "for", "to", "with", "by", "from", "related",
+              "fields", "field", "using", "based", "new", "study", "toward", "towards", "via", "its", "their"}
+
+# (suffix, replacement) pairs applied longest-first so "biology"/"biological" and
+# "chemistry"/"chemical" land on the same stem.
+_SUFFIXES = (
+    ("ologies", "olog"), ("ological", "olog"), ("ologist", "olog"), ("ology", "olog"),
+    ("istry", "ic"), ("ical", "ic"), ("ics", "ic"), ("ies", "y"), ("ing", ""), ("es", ""), ("s", ""),
+)
+
+
+def _stem(word: str) -> str:
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Stemmed unigrams plus adjacent bigrams, so phrases like "machine learning" count as a unit."""
+    words = [_stem(w) for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class LocalArchiveClassifier:
+    """
+    In-process archive classifier backed by a TF-IDF index over ARCHIVE_DEFINITIONS.
+
+    Each archive is scored by the share of a topic's idf-weighted terms that
+    appear in its vocabulary (`min_score` is the least share worth answering).
+    `classify()` returns `(archive, confidence)`, where confidence is the margin
+    between the best and second-best score relative to the best. Callers
+    should trust the answer only when `is_confident()` says so and fall back to
+    the model otherwise.
+    """
+
+    def __init__(self, threshold: float = 0.6, min_score: float = 0.25):
+        self.threshold = threshold
+        self.min_score = min_score
+
+        documents = [
+            tokenize(ARCHIVE_DEFINITIONS[archive]) + tokenize(ARCHIVE_KEYWORDS[archive]) for archive in ARCHIVES
+        ]
+        self.vocabulary = {term: i for i, term in enumerate(sorted({t for doc in documents for t in doc}))}
+
+        counts = np.zeros((len(ARCHIVES), len(self.vocabulary)))
+        for row, doc in enumerate(documents):
+            for term in doc:
+                counts[row, self.vocabulary[term]] += 1
+
+        df = (counts > 0).sum(axis=0)
+        self.idf = np.log((1 + len(ARCHIVES)) / (1 + df)) + 1
+        self.unknown_idf = float(np.log(1 + len(ARCHIVES)) + 1)
+        self.matrix = (counts > 0).astype(float) * self.idf
+        logger.info("Local archive index built with %d terms.", len(self.vocabulary))
+
+    def _vectorize(self, topics: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return term-presence rows for the topics and the idf mass of each topic's unigrams."""
+        vectors = np.zeros((len(topics), len(self.vocabulary)))
+        mass = np.zeros(len(topics))
+        for row, topic in enumerate(topics):
+            for term in tokenize(topic):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    vectors[row, column] = 1.0
+                if " " not in term:
+                    mass[row] += self.idf[column] if column is not None else self.unknown_idf
+        return vectors, mass
+
+    def classify_many(self, topics: list[str]) -> list[tuple[str | None, float]]:
+        if not topics:
+            return []
+
+        # Score = share of the topic's idf-weighted terms found in each archive's vocabulary.
+        vectors, mass = self._vectorize(topics)
+        scores = np.clip((vectors @ self.matrix.T) / np.maximum(mass, 1e-12)[:, None], 0.0, 1.0)
+        ranked = np.sort(scores, axis=1)
+        best, runner_up = ranked[:, -1], ranked[:, -2]
+        confidence = np.where(best > 0, (best - runner_up) / np.maximum(best, 1e-12), 0.0)
+        winners = scores.argmax(axis=1)
+
+        results = []
+        for i in range(len(topics)):
+            if best[i] < self.min_score:
+                results.append((None, 0.0))
+            else:
+                results.append((ARCHIVES[winners[i]], float(confidence[i])))
+        return results
+
+    def classify(self, topic: str) -> tuple[str | None, float]:
+        return self.classify_many([topic])[0]
+
+    def is_confident(self, confidence: float) -> bool:
+        return not math.isnan(confidence) and confidence >= self.threshold
+
+    def confident_archive(self, topic: str) -> str | None:
+        """Return the archive for `topic` if the local index is confident, else None."""
+        archive, confidence = self.classify(topic)
+        if archive and self.is_confident(confidence):
+            logger.debug("Local classifier: %s -> %s (%.2f)", topic, archive, confidence)
+            return archive
+        return None
+
+
+_local_classifier: LocalArchiveClassifier | None = None
+_local_classifier_lock = threading.Lock()
+
+
+def get_local_archive_classifier() -> LocalArchiveClassifier:
+    """Return the shared LocalArchiveClassifier (threshold from LOCAL_CLASSIFIER_THRESHOLD), building its index on first use."""
+    global _local_classifier
+    if _local_classifier is None:
+        with _local_classifier_lock:
+            if _local_classifier is None:
+                _local_classifier = LocalArchiveClassifier(threshold=get_settings().local_classifier_threshold)
+    return _local_classifier
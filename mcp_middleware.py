@@ -1,17 +1,112 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-from fastapi.responses import JSONResponse
-
-class MCPMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, api_key: str):
-        super().__init__(app)
-        self.api_key = api_key
-
-    async def dispatch(self, request: Request, call_next):
-        auth = request.headers.get("Authorization")
-        if auth != f"Bearer {self.api_key}":
-            return JSONResponse(
+import hmac
+import time
+from starlette.responses import JSONResponse
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+import metrics
+
+class TokenBucket:
+    """ Allow `rate` requests per second on average with bursts of up to `capacity` """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """ Consume a token; return 0 on success or the seconds until one is available """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class MCPMiddleware:
+    """
+    Pure ASGI bearer-token auth with per-key rate limiting.
+
+    Keys are encoded once at startup and every request is compared against all
+    of them with hmac.compare_digest, so several keys can be valid during a
+    rotation. Accepted requests are passed straight to the app: responses,
+    including streamed MCP/SSE bodies, are never buffered.
+    """
+
+    def __init__(self, app, api_key: str | None = None, api_keys: list[str] | None = None,
+                 rate: float = 0.0, burst: int = 20):
+        self.app = app
+        keys = [key for key in [api_key, *(api_keys or [])] if key]
+        self.api_keys = [key.encode() for key in dict.fromkeys(keys)]
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {key: TokenBucket(rate, burst) for key in self.api_keys} if rate > 0 else {}
+
+    def _match(self, scope) -> bytes | None:
+        auth = b""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                auth = value
+                break
+        token = auth[7:] if auth[:7].lower() == b"bearer " else b""
+
+        matched = None
+        for key in self.api_keys:
+            if hmac.compare_digest(token, key):
+                matched = key
+        return matched
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        method = scope.get("method", "WS")
+        key = self._match(scope)
+        if key is None:
+            metrics.record_http_request(method, 401, time.perf_counter() - started)
+            response = JSONResponse(
                 status_code=401,
                 content={"detail": "Unauthorized: Invalid or missing API key"}
             )
-        return await call_next(request)
+            await response(scope, receive, send)
+            return
+
+        bucket = self.buckets.get(key)
+        wait = bucket.take() if bucket else 0.0
+        if wait:
+            metrics.record_http_request(method, 429, time.perf_counter() - started)
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too Many Requests: rate limit exceeded for this API key"},
+                headers={"Retry-After": str(max(1, round(wait)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                metrics.record_http_request(method, message["status"], time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+class ToolMetricsMiddleware(Middleware):
+    """ FastMCP middleware that counts and times every tool call and labels nested stages with the tool name """
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        token = metrics.current_tool.set(tool)
+        metrics.TOOL_IN_FLIGHT.labels(tool).inc()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await call_next(context)
+            status = "ok"
+            return result
+        finally:
+            metrics.observe_stage("total", time.perf_counter() - started)
+            metrics.TOOL_IN_FLIGHT.labels(tool).dec()
+            metrics.TOOL_REQUESTS.labels(tool, status).inc()
+            metrics.current_tool.reset(token)
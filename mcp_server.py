@@ -1,39 +1,128 @@
-import os
-from fastmcp import FastMCP
-from dotenv import load_dotenv
-from archive_classifier import ArchiveClassifier
-from mcp_middleware import MCPMiddleware
-from openrouter_metadata_workflow_v2 import OpenRouterMetadataWorkflowV2
-from perplexity_metadata_workflow import PerplexityMetadataWorkflow
-from openrouter_metadata_workflow import OpenRouterMetadataWorkflow
-
-load_dotenv()
-API_KEY = os.getenv("MCP_API_KEY")
+import json
+import asyncio
+from fastmcp import FastMCP, Context
+from starlette.requests import Request
+from starlette.responses import Response
+import metrics
+from config import get_settings
+from mcp_middleware import MCPMiddleware, ToolMetricsMiddleware
+from metadata_batch import MetadataBatchRunner
+from metadata_cache import get_metadata_cache
+from metadata_jobs import JobQueueFull, MetadataJobRunner, build_job_store
+from model_router import get_model_router
+from openrouter_client import get_openrouter_client
+from single_flight import metadata_flights
+from workflow_registry import build_registry
+
+settings = get_settings()
+API_KEY = settings.mcp_api_key
+# Extra keys accepted alongside MCP_API_KEY (MCP_API_KEYS, comma-separated), e.g. while rotating keys.
+API_KEYS = list(settings.mcp_api_keys)
+# Requests per second allowed per API key (0 disables rate limiting) and the burst size.
+RATE_LIMIT = settings.mcp_rate_limit
+RATE_BURST = settings.mcp_rate_burst
+# Default fan-out limits for get_metadata_batch (0 tokens/minute means no budget).
+BATCH_CONCURRENCY = settings.metadata_batch_concurrency
+BATCH_TOKENS_PER_MINUTE = settings.metadata_batch_tpm
 
 mcp = FastMCP("MCP Demo")
+mcp.add_middleware(ToolMetricsMiddleware())
+
+# Workflows (and the modules, clients and classifier index behind them) are built on first use.
+workflows = build_registry(settings)
+# Background jobs for clients whose request timeout is shorter than an upstream call.
+jobs = MetadataJobRunner(
+    workflows, store=build_job_store(), workers=settings.job_workers, max_queue=settings.job_max_queue
+)
+JOB_WORKFLOWS = {"v1": "openrouter", "v2": "openrouter_v2"}
 
-# workflow_perplexity = PerplexityMetadataWorkflow()
-workflow_openrouter = OpenRouterMetadataWorkflow()
-workflow_openrouter_v2 = OpenRouterMetadataWorkflowV2()
-archive_classifier = ArchiveClassifier()
+async def stream_to_client(workflow, search_query: str, ctx: Context, bypass_cache: bool):
+    '''
+    Run a streaming workflow, forwarding each completed JSON field to the client
+    as a progress notification plus an info log, and return the parsed answer.
+    '''
+    completed = 0
+    async for event in workflow.astream(search_query, bypass_cache=bypass_cache):
+        if event["event"] == "field":
+            completed += 1
+            await ctx.report_progress(completed, total=len(workflow.FIELDS), message=event["name"])
+            await ctx.info(json.dumps({event["name"]: event["value"]}))
+        elif event["event"] == "done":
+            return event["result"].to_dict() if event["result"] else None
+    return None
 
-# @mcp.tool
-# async def get_metadata(search_query: str):
-#     ''' Retrieve structured metadata about a research topic from a specific archive using Perplexity '''
+if "perplexity" in workflows.names():
+    @mcp.tool
+    async def get_metadata_perplexity(search_query: str):
+        ''' Retrieve structured metadata about a research topic from a specific archive using Perplexity '''
 
-#     return workflow_perplexity.run(search_query)
+        return await asyncio.to_thread(workflows.get("perplexity").run, search_query)
 
 @mcp.tool
-async def get_metadata(search_query: str):
+async def get_metadata(search_query: str, ctx: Context, bypass_cache: bool = False, stream: bool = True):
     ''' Retrieve structured metadata about a research topic from a specific archive using OpenRouter '''
 
-    return workflow_openrouter.run(search_query)
+    workflow = workflows.get("openrouter")
+    if stream:
+        return await stream_to_client(workflow, search_query, ctx, bypass_cache)
+    result = await workflow.arun(search_query, bypass_cache=bypass_cache)
+    return result.to_dict() if result else None
 
 @mcp.tool
-async def get_metadata_v2(search_query: str):
+async def get_metadata_v2(search_query: str, ctx: Context, bypass_cache: bool = False, stream: bool = True):
     ''' Retrieve structured metadata about a research topic from a specific archive using OpenRouter '''
 
-    return workflow_openrouter_v2.run(search_query)
+    workflow = workflows.get("openrouter_v2")
+    if stream:
+        return await stream_to_client(workflow, search_query, ctx, bypass_cache)
+    result = await workflow.arun(search_query, bypass_cache=bypass_cache)
+    return result.to_dict() if result else None
+
+@mcp.tool
+async def get_metadata_batch(
+    topics: list[str],
+    ctx: Context,
+    max_concurrency: int = BATCH_CONCURRENCY,
+    tokens_per_minute: float = BATCH_TOKENS_PER_MINUTE,
+    bypass_cache: bool = False,
+):
+    '''
+    Retrieve v2 metadata for many research topics concurrently. Each result is sent to
+    the client as soon as it finishes; the return value lists every topic's status in input order.
+    '''
+    runner = MetadataBatchRunner(
+        workflows.get("openrouter_v2"),
+        max_concurrency=max(1, min(max_concurrency, BATCH_CONCURRENCY * 4)),
+        tokens_per_minute=tokens_per_minute or None,
+    )
+    results = [None] * len(topics)
+    async for item in runner.astream(topics, bypass_cache=bypass_cache):
+        results[item["index"]] = item
+        await ctx.report_progress(sum(r is not None for r in results), total=len(topics), message=item["topic"])
+        await ctx.info(json.dumps(item))
+    return results
+
+@mcp.tool
+async def submit_metadata_job(search_query: str, version: str = "v2", bypass_cache: bool = False):
+    '''
+    Start retrieving metadata for a research topic in the background and return a job id
+    right away; poll get_job_result with it. Cached topics come back already done.
+    '''
+    if version not in JOB_WORKFLOWS:
+        return {"status": "rejected", "error": f"Unknown version {version!r}; expected one of {list(JOB_WORKFLOWS)}."}
+    try:
+        return await jobs.submit(JOB_WORKFLOWS[version], search_query, bypass_cache=bypass_cache)
+    except JobQueueFull as e:
+        return {"status": "rejected", "error": str(e), "retry_after": round(e.retry_after, 1)}
+
+@mcp.tool
+async def get_job_result(job_id: str):
+    ''' Return a background metadata job's status (queued, running, done or failed) and its result once done '''
+
+    job = jobs.get(job_id)
+    if job is None:
+        return {"job_id": job_id, "status": "unknown", "error": "No such job, or its result has expired."}
+    return job
 
 @mcp.tool
 async def get_archive_classifier(topics_str: str):
@@ -41,7 +130,46 @@ async def get_archive_classifier(topics_str: str):
     Classify topics from a comma-separated string into their best archive.
     """
     topics_list = [t.strip() for t in topics_str.split(",") if t.strip()]
-    return archive_classifier.run(topics_list)
+    result = await workflows.get("archive_classifier").arun(topics_list)
+    return result.to_dict()
+
+@mcp.tool
+async def get_cache_stats():
+    ''' Report hit/miss/eviction counters for the metadata response cache '''
+
+    return get_metadata_cache().stats()
+
+@mcp.tool
+async def get_coalescing_stats():
+    ''' Report how many concurrent identical metadata requests shared one upstream call '''
+
+    return metadata_flights.stats()
+
+@mcp.tool
+async def get_router_stats():
+    ''' Report the latency/error averages the model router uses to pick a backend '''
+
+    router = get_model_router()
+    return {"fallbacks": router.fallbacks, "hedges": router.hedges, "hedge_wins": router.hedge_wins, "backends": router.stats()}
+
+@mcp.tool
+async def get_job_stats():
+    ''' Report background job queue depth, worker usage and outcomes '''
+
+    return jobs.stats()
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request):
+    ''' Prometheus scrape endpoint (behind the same API key as /nmj-mcp) '''
+
+    body, content_type = metrics.render(
+        cache=get_metadata_cache(),
+        flights=metadata_flights,
+        client=get_openrouter_client(),
+        router=get_model_router(),
+        jobs=jobs,
+    )
+    return Response(body, media_type=content_type)
 
 # if __name__ == "__main__":
 #     mcp.run(
@@ -57,6 +185,6 @@ async def get_archive_classifier(topics_str: str):
 app = mcp.http_app(
     path="/nmj-mcp",
     middleware=[
-        (MCPMiddleware, {}, {"api_key": API_KEY})
+        (MCPMiddleware, {}, {"api_key": API_KEY, "api_keys": API_KEYS, "rate": RATE_LIMIT, "burst": RATE_BURST})
     ]
 )
@@ -0,0 +1,109 @@
+import time
+import asyncio
+import logging
+from typing import AsyncIterator
+from openrouter_client import estimate_tokens
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("MetadataBatch")
+
+
+class TokenBudget:
+    """
+    Async token bucket measured in LLM tokens per minute.
+
+    `acquire(n)` waits until `n` tokens are available; waiters are served in
+    arrival order. A request larger than the whole budget is clamped to it so
+    it can still run once the bucket is full.
+    """
+
+    def __init__(self, tokens_per_minute: float):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float) -> float:
+        """Reserve `tokens`; return how long the caller waited."""
+        tokens = min(tokens, self.capacity)
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return time.monotonic() - started
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class MetadataBatchRunner:
+    """
+    Run one metadata workflow over many topics concurrently.
+
+    At most `max_concurrency` upstream requests are in flight at once. With a
+    `tokens_per_minute` budget, each cache miss first reserves its estimated
+    prompt tokens plus `max_tokens`. Cache hits skip both limits.
+    """
+
+    def __init__(self, workflow, max_concurrency: int = 8, tokens_per_minute: float | None = None,
+                 max_tokens: int = 2000):
+        self.workflow = workflow
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self.max_tokens = max_tokens
+
+    async def _run_one(self, index: int, topic: str, semaphore: asyncio.Semaphore, bypass_cache: bool) -> dict:
+        started = time.monotonic()
+        item = {"index": index, "topic": topic}
+        try:
+            result = None if bypass_cache else self.workflow.cached(topic)
+            if result is not None:
+                item["status"] = "cached"
+            else:
+                if self.budget is not None:
+                    prompt_tokens = sum(estimate_tokens(m["content"]) for m in self.workflow.PROMPT.messages(topic=topic))
+                    item["budget_wait"] = round(await self.budget.acquire(prompt_tokens + self.max_tokens), 3)
+                async with semaphore:
+                    # The cache was just checked above; a second lookup would count every miss twice.
+                    result = await self.workflow.arun(topic, bypass_cache=True)
+                item["status"] = "ok" if result is not None else "empty"
+            item["result"] = result.to_dict() if result is not None else None
+
+        except asyncio.CancelledError:
+            # The batch itself is being torn down: let the cancellation through.
+            if asyncio.current_task().cancelling():
+                raise
+            # Otherwise it came out of the workflow (e.g. a request this topic joined); fail just this topic.
+            logger.error(f"Batch item {topic!r} was cancelled by the workflow.")
+            item["status"] = "error"
+            item["error"] = "CancelledError: the request was cancelled."
+
+        except Exception as e:
+            logger.error(f"Batch item {topic!r} failed: {e}")
+            item["status"] = "error"
+            item["error"] = f"{type(e).__name__}: {e}"
+
+        item["elapsed"] = round(time.monotonic() - started, 3)
+        return item
+
+    async def astream(self, topics: list[str], bypass_cache: bool = False) -> AsyncIterator[dict]:
+        """Yield one status dict per topic, in completion order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.ensure_future(self._run_one(i, topic, semaphore, bypass_cache))
+            for i, topic in enumerate(topics)
+        ]
+        logger.info(f"Running batch of {len(tasks)} topics (concurrency {self.max_concurrency}).")
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,205 @@
+import re
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from config import get_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("MetadataCache")
+
+
+def normalize_topic(topic: str) -> str:
+    """Lower-case, trim surrounding punctuation and collapse whitespace so near-identical queries share a key."""
+    topic = re.sub(r"\s+", " ", str(topic)).strip().lower()
+    return topic.strip(" .,;:!?\"'")
+
+
+class MetadataCache:
+    """
+    Two-tier response cache for metadata completions.
+
+    The first tier is an in-memory LRU bounded by `max_entries`; the optional
+    second tier is a SQLite file at `path` so answers survive restarts. Every
+    entry expires `ttl` seconds after it was written. Writes to the SQLite
+    tier go through a background thread, so `set()` never waits on a disk
+    commit (it is called from the event loop).
+    """
+
+    WRITE_BATCH = 256
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Entries queued for the SQLite tier, so evicting one before its commit does not lose it.
+        self._pending: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # WAL lets lookups on this connection read while the writer thread commits on its own.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM metadata_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            self._writes: queue.Queue = queue.Queue()
+            threading.Thread(target=self._write_loop, name="MetadataCacheWriter", daemon=True).start()
+            atexit.register(self.flush)
+            logger.info("Persistent cache tier opened at %s.", path)
+
+    @staticmethod
+    def make_key(workflow: str, model: str, prompt_version: str, topic: str) -> str:
+        return "|".join((workflow, model, prompt_version, normalize_topic(topic)))
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+            entry = self._pending.get(key)
+            if entry is not None and entry[0] > now:
+                self._store(key, entry[1], entry[0])
+                self.hits += 1
+                return entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM metadata_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._pending[key] = (expires_at, value)
+        if self._db is not None:
+            self._writes.put((key, value, expires_at))
+
+    def _store(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _write_loop(self):
+        """Apply queued writes (None clears the table) on a connection of its own, one commit per batch."""
+        db = sqlite3.connect(self.path)
+        while True:
+            ops = [self._writes.get()]
+            while len(ops) < self.WRITE_BATCH:
+                try:
+                    ops.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for op in ops:
+                    if op is None:
+                        db.execute("DELETE FROM metadata_cache")
+                    else:
+                        db.execute(
+                            "INSERT OR REPLACE INTO metadata_cache (key, value, expires_at) VALUES (?, ?, ?)", op
+                        )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(ops)} entries to the persistent cache tier: {e}")
+            finally:
+                with self._lock:
+                    for op in ops:
+                        # A newer set() of the same key keeps its own pending entry.
+                        if op is not None and self._pending.get(op[0]) == (op[2], op[1]):
+                            del self._pending[op[0]]
+                for _ in ops:
+                    self._writes.task_done()
+
+    def flush(self):
+        """Block until every queued write has reached the SQLite tier."""
+        if self._db is not None:
+            self._writes.join()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+        if self._db is not None:
+            self._writes.put(None)
+            # Wait for the DELETE so lookups cannot read cleared entries back from disk.
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "persistent": self._db is not None,
+                "pending_writes": self._writes.qsize() if self._db is not None else 0,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: MetadataCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache() -> MetadataCache:
+    """
+    Return the shared MetadataCache, configured from METADATA_CACHE_SIZE,
+    METADATA_CACHE_TTL and METADATA_CACHE_PATH (unset keeps it in memory only).
+    """
+    global _cache
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            settings = get_settings()
+            _cache = MetadataCache(
+                max_entries=settings.metadata_cache_size,
+                ttl=settings.metadata_cache_ttl,
+                path=settings.metadata_cache_path,
+            )
+    return _cache
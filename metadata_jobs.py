@@ -0,0 +1,265 @@
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from config import get_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("MetadataJobs")
+
+
+class JobQueueFull(Exception):
+    """The job queue is at its depth limit; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, depth: int, retry_after: float):
+        super().__init__(f"Job queue is full ({depth} waiting); retry in {retry_after:.0f}s.")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class MemoryJobStore:
+    """Job records kept in this process for `ttl` seconds after their last update."""
+
+    blocking = False
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._jobs: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, job: dict):
+        now = time.time()
+        with self._lock:
+            self._jobs[job["job_id"]] = (now + self.ttl, dict(job))
+            self._jobs.move_to_end(job["job_id"])
+            # Every put refreshes the TTL and moves the job to the end, so expired jobs sit at the front.
+            while self._jobs:
+                expires_at, _ = next(iter(self._jobs.values()))
+                if expires_at > now:
+                    break
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] <= time.time():
+                return None
+            return dict(entry[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "jobs": len(self._jobs), "ttl": self.ttl}
+
+
+class SQLiteJobStore:
+    """
+    Job records in a SQLite file, so every server process on the host can
+    answer `get_job_result` for jobs submitted to any of them.
+    """
+
+    PURGE_EVERY = 500
+    # put() commits to disk, so MetadataJobRunner calls it off the event loop.
+    blocking = True
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS metadata_jobs ("
+            "job_id TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM metadata_jobs WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+        logger.info("Job store opened at %s.", path)
+
+    def put(self, job: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata_jobs (job_id, value, expires_at) VALUES (?, ?, ?)",
+                (job["job_id"], json.dumps(job), time.time() + self.ttl),
+            )
+            self._puts += 1
+            if self._puts % self.PURGE_EVERY == 0:
+                self._db.execute("DELETE FROM metadata_jobs WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM metadata_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            (jobs,) = self._db.execute("SELECT COUNT(*) FROM metadata_jobs").fetchone()
+        return {"backend": "sqlite", "path": self.path, "jobs": jobs, "ttl": self.ttl}
+
+
+class MetadataJobRunner:
+    """
+    Run metadata workflows in the background and keep their results in a job store.
+
+    `submit()` answers cache hits immediately and otherwise enqueues the job
+    and returns its id without waiting; `workers` tasks on the server's event
+    loop drain the queue. At most `max_queue` jobs wait at once: beyond that
+    `submit()` raises JobQueueFull with a retry hint instead of buffering
+    more work.
+    """
+
+    def __init__(self, workflows, store=None, workers: int = 4, max_queue: int = 100):
+        self.workflows = workflows
+        self.store = store or MemoryJobStore()
+        self.workers = workers
+        self.max_queue = max_queue
+
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+        # One writer thread keeps a job's updates in order while blocking stores commit off the loop.
+        self._writer = None
+        if self.store.blocking:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="JobStoreWriter")
+
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._job_seconds = 0.0
+
+    def _ensure_workers(self):
+        """Start the queue and worker tasks on the running loop, once per loop, and replace any that died."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"Started {self.workers} metadata job workers (queue limit {self.max_queue}).")
+            return
+
+        dead = [i for i, task in enumerate(self._tasks) if task.done()]
+        for i in dead:
+            self._tasks[i] = loop.create_task(self._worker())
+        if dead:
+            logger.warning(f"Restarted {len(dead)} metadata job workers that had stopped.")
+
+    def _retry_after(self) -> float:
+        """Rough wait until a queue slot frees up, from the average job duration so far."""
+        finished = self.completed + self.failed
+        average = self._job_seconds / finished if finished else 10.0
+        return max(1.0, average * self._queue.qsize() / self.workers)
+
+    async def submit(self, workflow: str, topic: str, bypass_cache: bool = False) -> dict:
+        self._ensure_workers()
+        runner = self.workflows.get(workflow)
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "workflow": workflow,
+            "topic": topic,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+
+        cached = None if bypass_cache else runner.cached(topic)
+        if cached is not None:
+            job.update(status="done", finished_at=job["submitted_at"], result=cached.to_dict())
+            self.submitted += 1
+            self.completed += 1
+            await self._save(job)
+            return job
+
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(self._queue.qsize(), self._retry_after()) from None
+        self.submitted += 1
+        await self._save(job)
+        return {**job, "queue_depth": self._queue.qsize()}
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    async def _save(self, job: dict):
+        if self._writer is None:
+            self.store.put(job)
+            return
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.store.put, dict(job))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: dict):
+        metrics.current_tool.set(f"job:{job['workflow']}")
+        job.update(status="running", started_at=time.time())
+        await self._save(job)
+        self.running += 1
+        try:
+            # submit() already looked the topic up in the cache; checking again would count the miss twice.
+            result = await self.workflows.get(job["workflow"]).arun(job["topic"], bypass_cache=True)
+            job.update(status="done", result=result.to_dict() if result is not None else None)
+            self.completed += 1
+        except asyncio.CancelledError:
+            job.update(status="failed", error="CancelledError: the job was cancelled.")
+            self.failed += 1
+            # Only propagate when this worker itself is being cancelled (shutdown); a cancellation
+            # coming out of the workflow (e.g. a request it joined) just fails this job.
+            if asyncio.current_task().cancelling():
+                raise
+            logger.error(f"Job {job['job_id']} ({job['topic']!r}) was cancelled by the workflow.")
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} ({job['topic']!r}) failed: {e}")
+            job.update(status="failed", error=f"{type(e).__name__}: {e}")
+            self.failed += 1
+        finally:
+            self.running -= 1
+            job["finished_at"] = time.time()
+            self._job_seconds += job["finished_at"] - job["started_at"]
+            await self._save(job)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "store": self.store.stats(),
+        }
+
+
+def build_job_store():
+    """SQLite store at JOB_STORE_PATH when set, otherwise in memory; results live JOB_RESULT_TTL seconds."""
+    settings = get_settings()
+    if settings.job_store_path:
+        return SQLiteJobStore(settings.job_store_path, ttl=settings.job_result_ttl)
+    return MemoryJobStore(ttl=settings.job_result_ttl)
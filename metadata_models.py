@@ -0,0 +1,120 @@
+import json
+from dataclasses import dataclass, field, fields, asdict
+from json_extract import extract_json
+from prompts import ARCHIVES
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "; ".join(_as_text(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return str(value).strip()
+
+
+def _as_list(value) -> list[str]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [_as_text(item) for item in value if _as_text(item)]
+    return [_as_text(value)]
+
+
+class _Result:
+    """Shared parsing and serialization for the workflow result dataclasses."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object for {cls.__name__}, got {type(data).__name__}.")
+        values = {}
+        for f in fields(cls):
+            raw = data.get(f.name)
+            values[f.name] = _as_list(raw) if f.type == list[str] else _as_text(raw)
+        return cls(**values)
+
+    @classmethod
+    def parse(cls, content: str):
+        return cls.from_dict(extract_json(content, dict))
+
+    @classmethod
+    def json_schema(cls) -> dict:
+        properties = {
+            f.name: {"type": "array", "items": {"type": "string"}} if f.type == list[str] else {"type": "string"}
+            for f in fields(cls)
+        }
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+
+    @classmethod
+    def response_format(cls) -> dict:
+        """OpenRouter `response_format` asking the model for exactly this object."""
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": cls.__name__, "strict": True, "schema": cls.json_schema()},
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+@dataclass(slots=True)
+class PaperMetadata(_Result):
+    """Answer schema of OpenRouterMetadataWorkflow."""
+
+    title: str = ""
+    references: list[str] = field(default_factory=list)
+    problem: list[str] = field(default_factory=list)
+    solution: list[str] = field(default_factory=list)
+    challenges: list[str] = field(default_factory=list)
+    techniques: list[str] = field(default_factory=list)
+    domains: list[str] = field(default_factory=list)
+    url: str = ""
+
+
+@dataclass(slots=True)
+class PaperMetadataV2(_Result):
+    """Answer schema of OpenRouterMetadataWorkflowV2."""
+
+    archive: str = ""
+    context: str = ""
+    key_idea: str = ""
+    method: str = ""
+    outcome: str = ""
+    projected_impact: str = ""
+
+
+@dataclass(slots=True)
+class ArchiveClassification:
+    """Merged answer of ArchiveClassifier: topic -> archive, plus the topics that could not be classified."""
+
+    archives: dict[str, str] = field(default_factory=dict)
+    failed: list[str] = field(default_factory=list)
+
+    @staticmethod
+    def response_format() -> dict:
+        # Not "strict": strict providers (OpenAI) reject schemas without fixed properties, and topics are open-ended keys.
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "ArchiveClassification",
+                "schema": {
+                    "type": "object",
+                    "additionalProperties": {"type": "string", "enum": list(ARCHIVES)},
+                },
+            },
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -0,0 +1,168 @@
+import logging
+import metrics
+from typing import AsyncIterator
+from json_stream import IncrementalJSONParser
+from local_archive_classifier import LocalArchiveClassifier
+from metadata_cache import MetadataCache, get_metadata_cache
+from model_router import DEFAULT_MODEL, WEB_SEARCH, ModelRouter, get_model_router
+from openrouter_client import OpenRouterClient, get_openrouter_client, supports_json_mode
+from prompts import ARCHIVE_HINT, PromptTemplate, prompt_version
+from single_flight import SingleFlight, metadata_flights
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+
+
+class MetadataWorkflow:
+    """
+    Shared plumbing of the OpenRouter metadata workflows: response cache,
+    coalescing of identical in-flight requests, JSON mode, streaming and
+    routing. Subclasses only name their `PROMPT`, `RESULT` dataclass, `FIELDS`
+    and `logger`.
+    """
+
+    PROMPT: PromptTemplate
+    RESULT: type
+    # The model has to find a real paper, so only web-search backends qualify.
+    REQUIRES = (WEB_SEARCH,)
+    FIELDS: tuple[str, ...] = ()
+    logger = logging.getLogger("MetadataWorkflow")
+
+    def __init__(
+        self,
+        model: str | None = None,
+        client: OpenRouterClient | None = None,
+        router: ModelRouter | None = None,
+        cache: MetadataCache | None = None,
+        flights: SingleFlight | None = None,
+        local_classifier: LocalArchiveClassifier | None = None,
+    ):
+        # Naming a model or client pins the workflow to it; otherwise calls go through the shared router.
+        if router is None and (model or client):
+            router = ModelRouter.single(client or get_openrouter_client(), model or DEFAULT_MODEL)
+        self.router = router or get_model_router()
+        self.cache = cache or get_metadata_cache()
+        self.flights = flights or metadata_flights
+        self.local_classifier = local_classifier
+        self.prompt_version = self.PROMPT.version
+        if local_classifier is not None:
+            # Hinted answers depend on the hint text and on when the classifier counts as confident.
+            self.prompt_version = prompt_version(f"{self.PROMPT.version}\0{ARCHIVE_HINT}\0{local_classifier.threshold}")
+
+    def build_messages(self, topic: str, model: str) -> list[dict]:
+        self.logger.debug(f"Building messages for topic: {topic}")
+        if self.local_classifier is not None:
+            archive = self.local_classifier.confident_archive(topic)
+            if archive:
+                topic += ARCHIVE_HINT.format(archive=archive)
+        return self.PROMPT.messages(model, topic=topic)
+
+    def build_payload(self, topic: str, model: str) -> dict:
+        payload = {
+            "model": model,
+            "messages": self.build_messages(topic, model),
+            "temperature": 0.7,
+            "max_tokens": 2000
+        }
+        if supports_json_mode(model):
+            payload["response_format"] = self.RESULT.response_format()
+        return payload
+
+    def cache_key(self, topic: str) -> str:
+        return MetadataCache.make_key(type(self).__name__, self.router.name, self.prompt_version, topic)
+
+    def cached(self, topic: str):
+        """Return the cached answer for `topic` without calling upstream."""
+        return self._load(self.cache_key(topic), topic)
+
+    def _load(self, key: str, topic: str):
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        self.logger.info(f"Cache hit for topic: {topic}")
+        return self.RESULT.parse(cached)
+
+    def _store(self, key: str, topic: str, content: str):
+        """Parse the model answer and cache its normalized JSON; empty (failed) answers give None."""
+        if not content:
+            return None
+        try:
+            with metrics.stage("parse"):
+                result = self.RESULT.parse(content)
+        except ValueError as e:
+            self.logger.error(f"Unparseable answer for topic {topic}: {e}")
+            raise
+        self.cache.set(key, result.to_json())
+        return result
+
+    def run(self, topic: str, bypass_cache: bool = False):
+        key = self.cache_key(topic)
+        if not bypass_cache:
+            cached = self._load(key, topic)
+            if cached is not None:
+                return cached
+
+        self.logger.info(f"Sending query for topic: {topic}")
+        content = self.router.complete(lambda model: self.build_payload(topic, model), self.REQUIRES)
+        return self._store(key, topic, content)
+
+    async def arun(self, topic: str, bypass_cache: bool = False):
+        key = self.cache_key(topic)
+        if not bypass_cache:
+            cached = self._load(key, topic)
+            if cached is not None:
+                return cached
+
+        return await self.flights.do(key, lambda: self._fetch(key, topic))
+
+    async def _fetch(self, key: str, topic: str):
+        self.logger.info(f"Sending query for topic: {topic}")
+        content = await self.router.acomplete(lambda model: self.build_payload(topic, model), self.REQUIRES)
+        return self._store(key, topic, content)
+
+    async def astream(self, topic: str, bypass_cache: bool = False) -> AsyncIterator[dict]:
+        """
+        Stream the completion for `topic` as events.
+
+        Yields {"event": "delta", "content": ...} for every text delta,
+        {"event": "field", "name": ..., "value": ...} as soon as each top-level
+        JSON field is complete, and finally {"event": "done", "result": ...}
+        with the parsed RESULT. Cache hits and calls that join an identical
+        in-flight request yield only the "done" event.
+        """
+        key = self.cache_key(topic)
+        if not bypass_cache:
+            cached = self._load(key, topic)
+            if cached is not None:
+                yield {"event": "done", "result": cached}
+                return
+
+        flight = self.flights.claim(key)
+        if flight is None:
+            yield {"event": "done", "result": await self.flights.do(key, lambda: self._fetch(key, topic))}
+            return
+
+        try:
+            self.logger.info(f"Streaming query for topic: {topic}")
+            parser = IncrementalJSONParser()
+            parts = []
+            async for delta in self.router.astream(lambda model: self.build_payload(topic, model), self.REQUIRES):
+                parts.append(delta)
+                yield {"event": "delta", "content": delta}
+                for name, value in parser.feed(delta):
+                    yield {"event": "field", "name": name, "value": value}
+
+            result = self._store(key, topic, "".join(parts))
+            flight.set_result(result)
+            yield {"event": "done", "result": result}
+
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+
+        finally:
+            # A cancelled or abandoned stream must not take the callers that joined it down too.
+            self.flights.abandon(key, flight, lambda: self._fetch(key, topic))
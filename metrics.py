@@ -0,0 +1,146 @@
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("Metrics")
+
+REGISTRY = CollectorRegistry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+TOOL_REQUESTS = Counter(
+    "mcp_tool_requests_total", "MCP tool calls by outcome.", ["tool", "status"], registry=REGISTRY
+)
+TOOL_IN_FLIGHT = Gauge("mcp_tool_in_flight", "MCP tool calls currently running.", ["tool"], registry=REGISTRY)
+TOOL_STAGE_SECONDS = Histogram(
+    "mcp_tool_stage_seconds",
+    "Time spent per stage of an MCP tool call (prompt_build, queue_wait, upstream_ttfb, upstream_total, parse, total).",
+    ["tool", "stage"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+UPSTREAM_RESPONSES = Counter(
+    "openrouter_responses_total", "OpenRouter responses by HTTP status.", ["model", "status"], registry=REGISTRY
+)
+UPSTREAM_IN_FLIGHT = Gauge("openrouter_in_flight", "OpenRouter requests currently open.", registry=REGISTRY)
+UPSTREAM_TOKENS = Counter(
+    "openrouter_tokens_total", "Tokens billed by OpenRouter, from the `usage` field.", ["model", "kind"],
+    registry=REGISTRY,
+)
+
+HTTP_REQUESTS = Counter(
+    "mcp_http_requests_total", "HTTP requests seen by MCPMiddleware.", ["method", "status"], registry=REGISTRY
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "mcp_http_request_seconds", "Time until MCPMiddleware saw the response start.", ["method"],
+    buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+
+CACHE_EVENTS = Gauge("metadata_cache_events", "Metadata cache counters since start.", ["event"], registry=REGISTRY)
+CACHE_HIT_RATIO = Gauge("metadata_cache_hit_ratio", "Metadata cache hits / lookups.", registry=REGISTRY)
+COALESCING = Gauge("single_flight_events", "Single-flight counters since start.", ["event"], registry=REGISTRY)
+POOL = Gauge("openrouter_pool", "OpenRouter connection pool statistics.", ["stat"], registry=REGISTRY)
+JOBS = Gauge("metadata_jobs", "Background metadata jobs by state since start.", ["state"], registry=REGISTRY)
+RESILIENCE = Gauge(
+    "openrouter_resilience_events", "Retries, fallbacks and hedges since start, from the client and the model router.",
+    ["source", "event"], registry=REGISTRY,
+)
+BREAKER_STATE = Gauge(
+    "openrouter_circuit_state", "Circuit breaker state per model (0 closed, 1 half-open, 2 open).", ["model"],
+    registry=REGISTRY,
+)
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+ROUTER = Gauge(
+    "model_router_backend", "Model router view of each backend (latency/error EWMAs, calls, failures).",
+    ["backend", "stat"], registry=REGISTRY,
+)
+
+# Tool name of the MCP call being served, so lower layers can label their timings.
+current_tool: ContextVar[str] = ContextVar("current_tool", default="none")
+
+
+def observe_stage(stage: str, seconds: float):
+    TOOL_STAGE_SECONDS.labels(current_tool.get(), stage).observe(seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+class UpstreamTimer:
+    """Track one OpenRouter request: in-flight gauge, time to first byte and total time."""
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.inc()
+        self.started = time.perf_counter()
+        return self
+
+    def first_byte(self, seconds: float | None = None):
+        observe_stage("upstream_ttfb", time.perf_counter() - self.started if seconds is None else seconds)
+
+    def __exit__(self, *exc):
+        UPSTREAM_IN_FLIGHT.dec()
+        observe_stage("upstream_total", time.perf_counter() - self.started)
+        return False
+
+
+def record_upstream(model: str, status_code: int, usage: dict | None = None):
+    UPSTREAM_RESPONSES.labels(model, str(status_code)).inc()
+    if usage:
+        UPSTREAM_TOKENS.labels(model, "prompt").inc(usage.get("prompt_tokens") or 0)
+        UPSTREAM_TOKENS.labels(model, "completion").inc(usage.get("completion_tokens") or 0)
+        # Prompt tokens the provider served from its prompt cache (billed at a discount).
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if cached:
+            UPSTREAM_TOKENS.labels(model, "cached").inc(cached)
+
+
+def record_http_request(method: str, status_code: int, seconds: float):
+    HTTP_REQUESTS.labels(method, str(status_code)).inc()
+    HTTP_REQUEST_SECONDS.labels(method).observe(seconds)
+
+
+def render(cache=None, flights=None, client=None, router=None, jobs=None) -> tuple[bytes, str]:
+    """Refresh the snapshot gauges from the given components and return (body, content type) for /metrics."""
+    if cache is not None:
+        stats = cache.stats()
+        for event in ("hits", "disk_hits", "misses", "evictions", "expirations", "entries"):
+            CACHE_EVENTS.labels(event).set(stats[event])
+        CACHE_HIT_RATIO.set(stats["hit_ratio"])
+    if flights is not None:
+        for event, value in flights.stats().items():
+            COALESCING.labels(event).set(value)
+    if client is not None:
+        for stat, value in client.pool_stats().items():
+            if isinstance(value, (int, float)):
+                POOL.labels(stat).set(value)
+        resilience = client.resilience_stats()
+        for event in ("retries", "hedges", "hedge_wins"):
+            RESILIENCE.labels("client", event).set(resilience[event])
+        for model, state in resilience["breakers"].items():
+            BREAKER_STATE.labels(model).set(BREAKER_STATES[state])
+    if jobs is not None:
+        stats = jobs.stats()
+        for state in ("queued", "running", "submitted", "completed", "failed", "rejected"):
+            JOBS.labels(state).set(stats[state])
+    if router is not None:
+        for event in ("fallbacks", "hedges", "hedge_wins"):
+            RESILIENCE.labels("router", event).set(getattr(router, event))
+        for backend in router.stats():
+            for stat in ("latency_ewma", "error_rate_ewma", "calls", "failures"):
+                if backend[stat] is not None:
+                    ROUTER.labels(backend["backend"], stat).set(backend[stat])
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,391 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+import metrics
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable
+from config import Settings, get_settings
+from openrouter_client import OpenRouterClient, get_openrouter_client
+from resilience import Deadline, DeadlineExceeded
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("ModelRouter")
+
+DEFAULT_MODEL = "perplexity/sonar"
+
+# Capability a metadata workflow needs: the model must look papers up on the web.
+WEB_SEARCH = "web_search"
+
+
+class NoBackendAvailable(LookupError):
+    """No configured backend offers the capabilities a call requires."""
+
+
+def infer_capabilities(provider: str, model: str) -> frozenset[str]:
+    """Capabilities of a backend whose config does not list them explicitly."""
+    searches = (
+        provider == "perplexity"
+        or model.startswith("perplexity/")
+        or model.endswith(":online")
+        or "search" in model
+    )
+    return frozenset({WEB_SEARCH}) if searches else frozenset()
+
+
+class BackendStats:
+    """Exponentially weighted moving averages of one backend's latency and error rate."""
+
+    __slots__ = ("alpha", "latency", "error_rate", "calls", "failures", "last_used", "probe_started")
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.last_used = 0.0
+        self.probe_started = 0.0
+
+    def record(self, seconds: float, ok: bool):
+        self.calls += 1
+        self.failures += not ok
+        self.last_used = time.monotonic()
+        self.probe_started = 0.0
+        self.error_rate = self.alpha * (not ok) + (1 - self.alpha) * self.error_rate
+        # Fast failures must not make a backend look fast, so only successes feed the latency average.
+        if ok:
+            self.latency = seconds if self.latency is None else self.alpha * seconds + (1 - self.alpha) * self.latency
+
+
+@dataclass(eq=False)
+class Backend:
+    """
+    One model behind one OpenAI-compatible endpoint.
+
+    `capabilities=None` means the caller pinned this backend and it is used
+    for every call regardless of what the call requires.
+    """
+
+    provider: str
+    model: str
+    client: OpenRouterClient
+    capabilities: frozenset[str] | None = None
+    weight: float = 1.0
+    fallback_only: bool = False
+    stats: BackendStats = field(default_factory=BackendStats)
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    def supports(self, requires) -> bool:
+        return self.capabilities is None or set(requires) <= self.capabilities
+
+    def healthy(self) -> bool:
+        return self.client.breaker(self.model).state != "open"
+
+
+class ModelRouter:
+    """
+    Send each call to the fastest healthy backend that has the required capabilities.
+
+    Backends are ranked by their latency EWMA, inflated by `error_penalty`
+    times their error-rate EWMA and divided by their `weight`. Backends never
+    tried yet, or not tried for `probe_interval` seconds, go first once so
+    their averages stay current. Only one call probes a backend: until it
+    reports back (or `probe_interval` passes) an untried backend ranks last
+    and a known one by the larger of its average and the probe's age.
+    `fallback_only` backends and those whose circuit breaker is open go
+    last. When a call fails the next `max_fallbacks` backends are tried
+    within the same deadline. With `hedge`, `acomplete()` also starts the
+    next ranked backend when the current one has not answered within its
+    observed p95 latency, and returns whichever succeeds first.
+
+    Callers pass a `build(model) -> payload` function rather than a payload,
+    because JSON mode and prompt-cache markers depend on the chosen model.
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        max_fallbacks: int = 2,
+        error_penalty: float = 4.0,
+        probe_interval: float = 30.0,
+        hedge: bool = False,
+    ):
+        if not backends:
+            raise ValueError("ModelRouter needs at least one backend.")
+        self.backends = backends
+        self.max_fallbacks = max_fallbacks
+        self.error_penalty = error_penalty
+        self.probe_interval = probe_interval
+        self.hedge = hedge
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._last_call = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def single(cls, client: OpenRouterClient, model: str = DEFAULT_MODEL) -> "ModelRouter":
+        """A router pinned to one model, for callers that name the model themselves."""
+        return cls([Backend("openrouter", model, client)], max_fallbacks=0)
+
+    @property
+    def name(self) -> str:
+        """Model label for cache keys: the model itself when pinned, otherwise "auto"."""
+        return self.backends[0].model if len(self.backends) == 1 else "auto"
+
+    def _probing(self, stats: BackendStats) -> bool:
+        # Expires after probe_interval, so a probe that never reports back (cancelled) cannot park the backend.
+        return stats.probe_started > 0 and time.monotonic() - stats.probe_started < self.probe_interval
+
+    def _needs_probe(self, stats: BackendStats) -> bool:
+        return stats.latency is None or self._last_call - stats.last_used > self.probe_interval
+
+    def score(self, backend: Backend) -> float:
+        stats = backend.stats
+        if self._probing(stats):
+            if stats.latency is None:
+                return float("inf")
+            # The probe's elapsed time is a floor on the backend's current latency, so a stall pushes it down the ranking.
+            latency = max(stats.latency, time.monotonic() - stats.probe_started)
+        elif self._needs_probe(stats):
+            return 0.0
+        else:
+            latency = stats.latency
+        return latency * (1 + self.error_penalty * stats.error_rate) / max(backend.weight, 1e-6)
+
+    def _rank(self, requires) -> list[Backend]:
+        candidates = [backend for backend in self.backends if backend.supports(requires)]
+        if not candidates:
+            raise NoBackendAvailable(f"No backend offers {', '.join(sorted(requires)) or 'the required capabilities'}.")
+        return sorted(candidates, key=lambda b: (not b.healthy(), b.fallback_only, self.score(b)))
+
+    def rank(self, requires=()) -> list[Backend]:
+        with self._lock:
+            return self._rank(requires)
+
+    def _attempts(self, requires) -> list[Backend]:
+        with self._lock:
+            attempts = self._rank(requires)[: 1 + self.max_fallbacks]
+            now = time.monotonic()
+            first = attempts[0].stats
+            # Ranking and claiming the probe under one lock keeps concurrent calls from probing it too.
+            if not self._probing(first) and self._needs_probe(first):
+                first.probe_started = now
+            self._last_call = now
+        return attempts
+
+    def _deadline(self, deadline: Deadline | None) -> Deadline:
+        return deadline or Deadline(self.backends[0].client.deadline)
+
+    @staticmethod
+    def _payload(build: Callable[[str], dict], backend: Backend) -> dict:
+        with metrics.stage("prompt_build"):
+            return build(backend.model)
+
+    def _record(self, backend: Backend, started: float, ok: bool):
+        with self._lock:
+            backend.stats.record(time.monotonic() - started, ok)
+
+    def _fall_back(self, backend: Backend, error: Exception, remaining: int):
+        """Re-raise when no fallback is left (or the deadline is spent), otherwise log and move on."""
+        if isinstance(error, DeadlineExceeded) or remaining == 0:
+            raise error
+        self.fallbacks += 1
+        logger.warning(f"{backend.name} failed ({error}); falling back.")
+
+    def complete(self, build: Callable[[str], dict], requires=(), deadline: Deadline | None = None) -> str:
+        deadline = self._deadline(deadline)
+        attempts = self._attempts(requires)
+        for i, backend in enumerate(attempts):
+            started = time.monotonic()
+            try:
+                content = backend.client.complete(self._payload(build, backend), deadline=deadline)
+            except Exception as e:
+                self._record(backend, started, ok=False)
+                self._fall_back(backend, e, remaining=len(attempts) - 1 - i)
+                continue
+            self._record(backend, started, ok=True)
+            return content
+
+    async def acomplete(self, build: Callable[[str], dict], requires=(), deadline: Deadline | None = None) -> str:
+        deadline = self._deadline(deadline)
+        waiting = self._attempts(requires)
+        running: dict[asyncio.Future, tuple[Backend, float, bool]] = {}
+
+        def start(hedged: bool = False):
+            backend = waiting.pop(0)
+            # The payload is rebuilt per backend: JSON mode and cache markers depend on the model.
+            call = backend.client.acomplete(self._payload(build, backend), deadline=deadline, hedge=False)
+            running[asyncio.ensure_future(call)] = (backend, time.monotonic(), hedged)
+
+        start()
+        try:
+            while running:
+                hedge_after = None
+                if self.hedge and waiting:
+                    primary = next(iter(running.values()))[0]
+                    hedge_after = primary.client.hedge_delay(primary.model)
+                done, _ = await asyncio.wait(running, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    logger.info(f"{primary.name} slower than {hedge_after:.2f}s; hedging with {waiting[0].name}.")
+                    start(hedged=True)
+                    continue
+
+                for task in done:
+                    backend, started, hedged = running.pop(task)
+                    if task.exception() is None:
+                        self._record(backend, started, ok=True)
+                        self.hedge_wins += hedged
+                        return task.result()
+                    self._record(backend, started, ok=False)
+                    self._fall_back(backend, task.exception(), remaining=len(waiting) + len(running))
+                if not running:
+                    start()
+        finally:
+            # A losing hedge is cancelled without a verdict, so it does not count against its backend.
+            for task in running:
+                task.cancel()
+
+    async def astream(self, build: Callable[[str], dict], requires=(), deadline: Deadline | None = None) -> AsyncIterator[str]:
+        """Stream from the best backend; fall back only while nothing has been yielded yet."""
+        deadline = self._deadline(deadline)
+        attempts = self._attempts(requires)
+        for i, backend in enumerate(attempts):
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for delta in backend.client.astream(self._payload(build, backend), deadline=deadline):
+                    streamed = True
+                    yield delta
+            except Exception as e:
+                self._record(backend, started, ok=False)
+                self._fall_back(backend, e, remaining=0 if streamed else len(attempts) - 1 - i)
+                continue
+            self._record(backend, started, ok=True)
+            return
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "backend": backend.name,
+                    "capabilities": sorted(backend.capabilities) if backend.capabilities is not None else None,
+                    "weight": backend.weight,
+                    "fallback_only": backend.fallback_only,
+                    "breaker": backend.client.breaker(backend.model).state,
+                    "latency_ewma": round(backend.stats.latency, 3) if backend.stats.latency is not None else None,
+                    "error_rate_ewma": round(backend.stats.error_rate, 3),
+                    "probing": self._probing(backend.stats),
+                    "calls": backend.stats.calls,
+                    "failures": backend.stats.failures,
+                }
+                for backend in self.backends
+            ]
+
+
+_perplexity_client: OpenRouterClient | None = None
+_router: ModelRouter | None = None
+_router_lock = threading.Lock()
+
+
+def get_perplexity_client(settings: Settings | None = None) -> OpenRouterClient:
+    """
+    Shared client for Perplexity's own chat completions API.
+
+    Perplexity speaks the same OpenAI-compatible protocol as OpenRouter, so it
+    reuses OpenRouterClient's pooling, retries and circuit breakers.
+    """
+    global _perplexity_client
+    if _perplexity_client is None:
+        settings = settings or get_settings()
+        if not settings.perplexity_api_key:
+            logger.error("PERPLEXITY_API_KEY not found in environment variables.")
+            raise EnvironmentError("Missing Perplexity API key.")
+        _perplexity_client = OpenRouterClient(
+            settings.perplexity_api_key,
+            api_url=settings.perplexity_api_url,
+            max_connections=settings.openrouter_max_connections,
+            max_keepalive_connections=settings.openrouter_max_keepalive,
+            deadline=settings.openrouter_deadline,
+            attempt_timeout=settings.openrouter_attempt_timeout,
+        )
+        logger.info("Perplexity client initialized.")
+    return _perplexity_client
+
+
+def default_backends(settings: Settings) -> list[dict]:
+    backends = [{"provider": "openrouter", "model": DEFAULT_MODEL}]
+    if "perplexity" in settings.metadata_providers and settings.perplexity_api_key:
+        backends.append({"provider": "perplexity", "model": "sonar"})
+    return backends
+
+
+def build_router(settings: Settings | None = None) -> ModelRouter:
+    """
+    Build a router from MODEL_BACKENDS, a JSON list such as
+
+        [{"provider": "openrouter", "model": "perplexity/sonar", "weight": 2},
+         {"provider": "openrouter", "model": "openai/gpt-4o-mini:online"},
+         {"provider": "perplexity", "model": "sonar", "fallback_only": true}]
+
+    where "capabilities" defaults to what infer_capabilities() derives from the model name.
+    OPENROUTER_HEDGE_MODEL turns on hedging and, unless it is listed already,
+    adds that model as a fallback-only backend; calls only hedge to backends
+    with the capabilities they require.
+    """
+    settings = settings or get_settings()
+    specs = json.loads(settings.model_backends) if settings.model_backends else default_backends(settings)
+    hedge_model = settings.openrouter_hedge_model
+    if hedge_model and not any(spec["model"] == hedge_model for spec in specs):
+        specs = [*specs, {"provider": "openrouter", "model": hedge_model, "fallback_only": True}]
+    clients = {"openrouter": get_openrouter_client, "perplexity": lambda: get_perplexity_client(settings)}
+
+    backends = []
+    for spec in specs:
+        provider, model = spec.get("provider", "openrouter"), spec["model"]
+        if provider not in clients:
+            raise ValueError(f"Unknown provider {provider!r} in MODEL_BACKENDS; expected one of {list(clients)}.")
+        capabilities = spec.get("capabilities")
+        backends.append(Backend(
+            provider,
+            model,
+            clients[provider](),
+            capabilities=frozenset(capabilities) if capabilities is not None else infer_capabilities(provider, model),
+            weight=float(spec.get("weight", 1.0)),
+            fallback_only=bool(spec.get("fallback_only", False)),
+            stats=BackendStats(settings.router_ewma_alpha),
+        ))
+    return ModelRouter(
+        backends,
+        max_fallbacks=settings.router_max_fallbacks,
+        probe_interval=settings.router_probe_interval,
+        hedge=bool(hedge_model),
+    )
+
+
+def get_model_router() -> ModelRouter:
+    """Return the shared ModelRouter, built from MODEL_BACKENDS (or the defaults) on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = build_router()
+                logger.info(f"Model router initialized with {', '.join(b.name for b in _router.backends)}.")
+    return _router
+
+
+def set_model_router(router: ModelRouter | None):
+    """Replace the shared router (pass None to rebuild it from the settings)."""
+    global _router
+    with _router_lock:
+        _router = router
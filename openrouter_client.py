@@ -0,0 +1,538 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+from config import get_settings
+from resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceeded,
+    LatencyTracker,
+    OpenRouterError,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("OpenRouterClient")
+
+OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting chunks and batches."""
+    return len(text) // 4 + 1
+
+
+def supports_json_mode(model: str) -> bool:
+    """Whether the model's provider honours `response_format` JSON schema mode (OPENROUTER_JSON_MODE_MODELS prefixes)."""
+    return model.startswith(get_settings().openrouter_json_mode_models)
+
+
+class OpenRouterClient:
+    """
+    Process-wide transport for the OpenRouter chat completions endpoint.
+
+    `complete()` goes through a keep-alive `requests.Session` for scripts,
+    `acomplete()` through a pooled `httpx.AsyncClient` (HTTP/2 when `h2` is
+    installed) so MCP tools never block the event loop. Use
+    `get_openrouter_client()` rather than constructing one per workflow so every
+    caller reuses the same TCP/TLS connections.
+
+    Every request runs under a `Deadline` (default `deadline` seconds) with a
+    per-attempt timeout, retries 429/5xx and transport errors with jittered
+    backoff that honours Retry-After, and skips models whose `CircuitBreaker`
+    is open. With a `hedge_model`, `acomplete()` also sends the request to that
+    model when the primary has not answered by its observed p95 latency and
+    returns whichever succeeds first (ModelRouter turns this off and hedges
+    across its backends instead).
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = OPENROUTER_API_URL,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        deadline: float = 90.0,
+        attempt_timeout: float = 45.0,
+        connect_timeout: float = 5.0,
+        retry_policy: RetryPolicy | None = None,
+        hedge_model: str | None = None,
+        hedge_after: float = 8.0,
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.connect_timeout = connect_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.hedge_model = hedge_model
+        self.hedge_after = hedge_after
+
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latencies: dict[str, LatencyTracker] = {}
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+        self._session = requests.Session()
+        self._session.headers.update(self._headers())
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._async_slots: asyncio.Semaphore | None = None
+
+        self._sync_requests = 0
+        self._async_requests = 0
+        self._async_pools_created = 0
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the loop they were first used on, so scripts
+        # that call asyncio.run() more than once get a fresh pool each time.
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                headers=self._headers(),
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=None,
+            )
+            self._async_loop = loop
+            self._async_slots = asyncio.Semaphore(self.max_connections)
+            self._async_pools_created += 1
+            logger.info(
+                "Async connection pool created (max_connections=%d, http2=%s).",
+                self.max_connections, self.http2,
+            )
+        return self._async_client
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(model)
+        return self._breakers[model]
+
+    def latency(self, model: str) -> LatencyTracker:
+        if model not in self._latencies:
+            self._latencies[model] = LatencyTracker()
+        return self._latencies[model]
+
+    def hedge_delay(self, model: str) -> float:
+        """Observed p95 latency of `model` once there are enough samples, else `hedge_after`."""
+        tracker = self.latency(model)
+        if len(tracker) < 20:
+            return self.hedge_after
+        return tracker.percentile(0.95)
+
+    def _attempt_budget(self, deadline: Deadline) -> float:
+        deadline.check()
+        return min(self.attempt_timeout, deadline.remaining())
+
+    @staticmethod
+    def _extract_content(model: str, status_code: int, text: str, headers, result) -> str:
+        if status_code != 200:
+            metrics.record_upstream(model, status_code)
+            raise OpenRouterError(status_code, text, parse_retry_after(headers.get("Retry-After")))
+
+        body = result()
+        metrics.record_upstream(model, status_code, body.get("usage"))
+        return body["choices"][0]["message"]["content"]
+
+    @staticmethod
+    @asynccontextmanager
+    async def _within(deadline: Deadline):
+        """
+        Bound the awaits in the block by what is left of `deadline`.
+
+        httpx timeouts apply per read, so an upstream that drips a byte at a
+        time would otherwise keep an attempt alive well past the deadline.
+        """
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                yield
+        except TimeoutError as e:
+            if isinstance(e, DeadlineExceeded):
+                raise
+            raise DeadlineExceeded(f"Latency budget of {deadline.seconds:.1f}s exhausted.") from e
+
+    async def _acquire_slot(self):
+        """Wait for one of `max_connections` request slots, recording the wait as queue time."""
+        queued = time.perf_counter()
+        await self._async_slots.acquire()
+        metrics.observe_stage("queue_wait", time.perf_counter() - queued)
+
+    def _on_success(self, model: str, started: float):
+        self.breaker(model).record_success()
+        self.latency(model).record(time.monotonic() - started)
+        logger.info("Query completed successfully.")
+
+    def _settle_trial(self, model: str, trial: bool):
+        """
+        Hand back a half-open trial whatever ended the attempt.
+
+        Successes and server-side failures have already settled the breaker;
+        this covers 4xx answers, deadlines and cancellation (a losing hedge, a
+        dropped client), which would otherwise keep the circuit blocked.
+        """
+        if trial:
+            self.breaker(model).release_trial()
+
+    def _on_failure(self, model: str, error: Exception, attempt: int, deadline: Deadline) -> float:
+        """Record a failed attempt and return how long to wait before retrying, or re-raise."""
+        if isinstance(error, OpenRouterError):
+            retryable, server_side, retry_after = error.retryable, error.status_code >= 500, error.retry_after
+        elif isinstance(error, (httpx.TransportError, requests.ConnectionError, requests.Timeout)):
+            retryable, server_side, retry_after = True, True, None
+        else:
+            retryable, server_side, retry_after = False, False, None
+
+        if server_side:
+            self.breaker(model).record_failure()
+
+        delay = self.retry_policy.delay(attempt, retry_after)
+        if not retryable or attempt >= self.retry_policy.max_attempts or delay >= deadline.remaining():
+            logger.error(f"Failed to query OpenRouter ({model}, attempt {attempt}): {error}")
+            if retryable and deadline.remaining() <= delay:
+                raise DeadlineExceeded(f"Latency budget of {deadline.seconds:.1f}s exhausted: {error}") from error
+            raise error
+
+        self.retries += 1
+        logger.warning(f"Attempt {attempt} for {model} failed ({error}); retrying in {delay:.2f}s.")
+        return delay
+
+    def complete(self, payload: dict, deadline: Deadline | None = None) -> str:
+        """
+        Blocking completion for scripts.
+
+        The deadline is best-effort here: it is checked between attempts and
+        caps each attempt's read timeout, but requests applies that timeout
+        per socket read, so an upstream that keeps trickling bytes can run past
+        it. The async methods enforce the deadline strictly.
+        """
+        deadline = deadline or Deadline(self.deadline)
+        model = payload.get("model", "")
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = self.breaker(model).check()
+            started = time.monotonic()
+            try:
+                self._sync_requests += 1
+                with metrics.UpstreamTimer() as upstream:
+                    response = self._session.post(
+                        self.api_url, json=payload, timeout=(self.connect_timeout, self._attempt_budget(deadline))
+                    )
+                    upstream.first_byte(response.elapsed.total_seconds())
+                content = self._extract_content(
+                    model, response.status_code, response.text, response.headers, response.json
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                delay = self._on_failure(model, e, attempt, deadline)
+            else:
+                self._on_success(model, started)
+                return content
+            finally:
+                self._settle_trial(model, trial)
+            time.sleep(delay)
+
+    async def _acomplete_once(self, payload: dict, deadline: Deadline) -> str:
+        model = payload.get("model", "")
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = self.breaker(model).check()
+            started = time.monotonic()
+            try:
+                client = self._get_async_client()
+                request = client.build_request(
+                    "POST",
+                    self.api_url,
+                    json=payload,
+                    timeout=httpx.Timeout(self._attempt_budget(deadline), connect=self.connect_timeout),
+                )
+                async with self._within(deadline):
+                    await self._acquire_slot()
+                    try:
+                        self._async_requests += 1
+                        with metrics.UpstreamTimer() as upstream:
+                            response = await client.send(request, stream=True)
+                            upstream.first_byte()
+                            try:
+                                await response.aread()
+                            finally:
+                                await response.aclose()
+                    finally:
+                        self._async_slots.release()
+                content = self._extract_content(
+                    model, response.status_code, response.text, response.headers, response.json
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                delay = self._on_failure(model, e, attempt, deadline)
+            else:
+                self._on_success(model, started)
+                return content
+            finally:
+                self._settle_trial(model, trial)
+            await asyncio.sleep(delay)
+
+    async def acomplete(
+        self, payload: dict, deadline: Deadline | None = None, hedge_model: str | None = None, hedge: bool = True
+    ) -> str:
+        """
+        Complete `payload`, hedging to `hedge_model` (default: the client's) when the primary is slow.
+
+        ModelRouter passes `hedge=False`: it hedges across its own backends,
+        which respects the capabilities a call requires and rebuilds the
+        payload for the hedge model.
+        """
+        deadline = deadline or Deadline(self.deadline)
+        hedge_model = (hedge_model or self.hedge_model) if hedge else None
+        model = payload.get("model", "")
+        if not hedge_model or hedge_model == model:
+            return await self._acomplete_once(payload, deadline)
+
+        primary = asyncio.ensure_future(self._acomplete_once(payload, deadline))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=min(self.hedge_delay(model), deadline.remaining()))
+            if done and primary.exception() is None:
+                return primary.result()
+
+            # Primary is slow, or failed outright (e.g. open circuit): try the fallback model.
+            self.hedges += 1
+            logger.info(f"{model} slower than {self.hedge_delay(model):.2f}s or failed; hedging with {hedge_model}.")
+            hedge = asyncio.ensure_future(self._acomplete_once({**payload, "model": hedge_model}, deadline))
+            pending.add(hedge)
+            error = primary.exception() if done else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += int(task is hedge)
+                        return task.result()
+                    error = task.exception()
+            raise error
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, payload: dict, deadline: Deadline | None = None) -> AsyncIterator[str]:
+        """
+        Yield content deltas from a `stream: true` completion as the SSE events arrive.
+
+        Failures before the first delta are retried like `acomplete()`; once
+        content has been yielded the stream cannot be replayed, so later errors
+        are raised to the caller.
+        """
+        deadline = deadline or Deadline(self.deadline)
+        model = payload.get("model", "")
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = self.breaker(model).check()
+            started = time.monotonic()
+            yielded = False
+            try:
+                client = self._get_async_client()
+                request = client.build_request(
+                    "POST",
+                    self.api_url,
+                    json={**payload, "stream": True},
+                    timeout=httpx.Timeout(self._attempt_budget(deadline), connect=self.connect_timeout),
+                )
+                async with self._within(deadline):
+                    await self._acquire_slot()
+                try:
+                    self._async_requests += 1
+                    with metrics.UpstreamTimer() as upstream:
+                        # The deadline wraps each await rather than the whole body, which yields to the caller.
+                        async with self._within(deadline):
+                            response = await client.send(request, stream=True)
+                        try:
+                            upstream.first_byte()
+                            if response.status_code != 200:
+                                async with self._within(deadline):
+                                    await response.aread()
+                                metrics.record_upstream(model, response.status_code)
+                                raise OpenRouterError(
+                                    response.status_code,
+                                    response.text,
+                                    parse_retry_after(response.headers.get("Retry-After")),
+                                )
+
+                            usage = None
+                            lines = response.aiter_lines()
+                            while True:
+                                async with self._within(deadline):
+                                    line = await anext(lines, None)
+                                if line is None:
+                                    break
+                                # Blank lines separate events; lines starting with ":" are keep-alive comments.
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+
+                                event = json.loads(data)
+                                usage = event.get("usage") or usage
+                                choices = event.get("choices") or [{}]
+                                content = choices[0].get("delta", {}).get("content")
+                                if content:
+                                    yielded = True
+                                    yield content
+                            metrics.record_upstream(model, response.status_code, usage)
+                        finally:
+                            await response.aclose()
+                finally:
+                    self._async_slots.release()
+
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if yielded:
+                    logger.error(f"Stream from OpenRouter broke mid-answer: {e}")
+                    raise
+                delay = self._on_failure(model, e, attempt, deadline)
+            else:
+                self._on_success(model, started)
+                return
+            finally:
+                self._settle_trial(model, trial)
+            await asyncio.sleep(delay)
+
+    def resilience_stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "breakers": {model: breaker.state for model, breaker in self._breakers.items()},
+            "p95_latency": {model: tracker.percentile(0.95) for model, tracker in self._latencies.items()},
+        }
+
+    def pool_stats(self) -> dict:
+        """Return request counters and open-connection counts for both pools."""
+        sync_connections = 0
+        pools = self._session.get_adapter(self.api_url).poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            if pool is not None:
+                sync_connections += pool.num_connections
+
+        async_connections = 0
+        async_idle = 0
+        if self._async_client is not None:
+            # httpx does not expose its pool publicly; read it defensively.
+            pool = getattr(self._async_client._transport, "_pool", None)
+            for connection in getattr(pool, "connections", []):
+                async_connections += 1
+                async_idle += int(connection.is_idle())
+
+        return {
+            "api_url": self.api_url,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "sync_requests": self._sync_requests,
+            "sync_connections_opened": sync_connections,
+            "async_requests": self._async_requests,
+            "async_pools_created": self._async_pools_created,
+            "async_connections": async_connections,
+            "async_idle_connections": async_idle,
+        }
+
+    def close(self):
+        self._session.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+
+_client: OpenRouterClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_openrouter_client() -> OpenRouterClient:
+    """
+    Return the shared OpenRouterClient, creating it from the environment on first use.
+
+    OPENROUTER_API_URL points the client at another endpoint (e.g. a local fake
+    server in tests); OPENROUTER_MAX_CONNECTIONS and OPENROUTER_MAX_KEEPALIVE
+    tune the pool; OPENROUTER_DEADLINE, OPENROUTER_ATTEMPT_TIMEOUT,
+    OPENROUTER_MAX_ATTEMPTS and OPENROUTER_HEDGE_MODEL tune the resilience layer.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            settings = get_settings()
+            api_key = settings.openrouter_api_key
+            if not api_key:
+                logger.error("OPENROUTER_API_KEY not found in environment variables.")
+                raise EnvironmentError("Missing OpenRouter API key.")
+
+            _client = OpenRouterClient(
+                api_key,
+                api_url=settings.openrouter_api_url,
+                max_connections=settings.openrouter_max_connections,
+                max_keepalive_connections=settings.openrouter_max_keepalive,
+                deadline=settings.openrouter_deadline,
+                attempt_timeout=settings.openrouter_attempt_timeout,
+                retry_policy=RetryPolicy(max_attempts=settings.openrouter_max_attempts),
+                hedge_model=settings.openrouter_hedge_model,
+            )
+            logger.info("OpenRouter client initialized.")
+    return _client
+
+
+def set_openrouter_client(client: OpenRouterClient | None):
+    """Replace the shared client (pass None to rebuild it from the environment)."""
+    global _client
+    with _client_lock:
+        _client = client
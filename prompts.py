@@ -0,0 +1,157 @@
+import hashlib
+from dataclasses import dataclass, field
+
+ARCHIVES = ("arXiv", "PubMed", "bioRxiv", "ChemRxiv")
+
+# Subject areas exactly as they are given to the model in the classification prompts.
+ARCHIVE_DEFINITIONS = {
+    "arXiv": "Physics, mathematics, computer science, quantitative biology, quantitative finance, statistics, electrical engineering and systems science, and economics",
+    "PubMed": "Biomedicine and health, with related fields in the life sciences, behavioral sciences, chemical sciences, and bioengineering.",
+    "bioRxiv": "Biochemistry, Bioinformatics, Biophysics, Cancer Biology, Cell Biology, Developmental Biology, Ecology, Evolutionary Biology, Genetics, Genomics, Immunology, Microbiology, Molecular Biology, Neuroscience, Paleontology, Pathology, Pharmacology and Toxicology, Physiology, Plant Biology, Scientific Communication and Education, Synthetic Biology, Systems Biology, and Zoology.",
+    "ChemRxiv": "Agricultural and Food Chemistry, Analytical Chemistry, Biological and Mecidinal Chemistry, Catalysis, Chemical Education, Chemical Engineering and Industrial Chemistry, Earth Chemistry, Space Chemistry, Environmental Chemistry, Energy, Inorganic Chemistry, Materials Chemistry, Nanoscience and Nanotechnology, Organic Chemistry, Organometallic Chemistry, Physical Chemistry, Polymer Chemistry, Theoretical and Computational Chemistry.",
+}
+
+ARCHIVE_LIST = "\n".join(f"- {name}: {text}" for name, text in ARCHIVE_DEFINITIONS.items())
+
+# Providers that only cache a prompt prefix when it is marked explicitly; the others
+# (OpenAI, DeepSeek, Grok, ...) cache identical prefixes automatically.
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+
+def prompt_version(prompt: str) -> str:
+    """Short content hash of a prompt template, used to invalidate cached answers when the prompt changes."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A prompt split into a static system message and a small per-call user message.
+
+    `system` is rendered once, when the module is imported, and is byte-for-byte
+    identical on every call so providers can serve it from their prompt cache;
+    only `user` is formatted per call. `version` hashes both parts.
+    """
+
+    name: str
+    system: str
+    user: str
+    version: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "version", prompt_version(f"{self.system}\0{self.user}"))
+
+    def render(self, **values) -> str:
+        return self.user.format(**values)
+
+    def messages(self, model: str | None = None, **values) -> list[dict]:
+        """Chat messages for OpenRouter; the system part carries `cache_control` where the provider needs it."""
+        system = self.system
+        if model and model.startswith(CACHE_CONTROL_MODEL_PREFIXES):
+            system = [{"type": "text", "text": self.system, "cache_control": {"type": "ephemeral"}}]
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": self.render(**values)},
+        ]
+
+    def text(self, **values) -> str:
+        """The whole prompt as one string (static part first) for single-message APIs."""
+        return f"{self.system}\n\n{self.render(**values)}"
+
+
+METADATA_V1 = PromptTemplate(
+    name="metadata_v1",
+    system=f"""You are a scientific research assistant that performs two tasks on the research topic given by the user.
+
+### TASK 1: Classify the topic to the appropriate academic archive
+
+Given a research topic or subject, classify which of the following archives it is most relevant to:
+
+{ARCHIVE_LIST}
+
+Respond with the single best matching archive based on the topic.
+
+### TASK 2: Get a paper from the selected archive about the topic and extract structured information.
+
+Given the selected archive and the topic, retrieve a relevant paper and extract the following fields:
+
+1. What is the title of the paper?
+2. What are the references of the paper?
+3. What problem is the paper addressing? Break this down into a list of topics or phrases.
+4. What is the proposed solution or method? Break this down into a list of solutions or methods.
+5. What are the remaining challenges? Break this down into a list of challenges.
+6. What techniques are used, and what are they applied to? Break this down into a list of techniques and things that they are applied to.
+7. What domains could this work apply to? Break this down into a list of work domains that this could apply to.
+8. The paper URL.
+
+Return the result as a **JSON object only**, with the following structure:
+
+{{
+    "title": "...",
+    "references": [...],
+    "problem": [...],
+    "solution": [...],
+    "challenges": [...],
+    "techniques": [...],
+    "domains": [...],
+    "url": "..."
+}}""",
+    user="Topic: {topic}",
+)
+
+METADATA_V2 = PromptTemplate(
+    name="metadata_v2",
+    system=f"""You are a scientific research assistant that performs two tasks on the research topic given by the user.
+
+### TASK 1: Classify the Topic
+Classify the research topic into one of the following academic archives:
+
+{ARCHIVE_LIST}
+
+Respond with the single best matching archive name only.
+
+### TASK 2: Retrieve and Extract Paper Information
+From the chosen archive, retrieve a relevant paper about the topic and extract the following fields, based on the definitions below:
+
+1. Context – The status quo of related literature or reality that motivated this study (problem, research question, or gap not addressed by previous work).
+2. Key Idea – The main intellectual merit or novel idea/solution proposed in this study, compared to existing literature.
+3. Method – The specific research method used to test or validate the key idea (experimental setup, theoretical framework, or other validation methods).
+4. Outcome – The factual results and conclusions, including whether the hypothesis was supported.
+5. Projected Impact – The anticipated impact on the field, including possible future research directions.
+
+### Output Format
+Return your final answer as a single JSON object in this format, with no extra text or commentary:
+
+{{
+    "archive": "arXiv",
+    "context": "...",
+    "key_idea": "...",
+    "method": "...",
+    "outcome": "...",
+    "projected_impact": "..."
+}}""",
+    user="Topic: {topic}",
+)
+
+# Appended to the user message when the local classifier has already settled TASK 1.
+ARCHIVE_HINT = "\nTASK 1 is already answered: the archive is {archive}. Use it for TASK 2."
+
+ARCHIVE_CLASSIFICATION = PromptTemplate(
+    name="archive_classification",
+    system=f"""You are a scientific research assistant. Classify each topic given by the user into one of:
+{", ".join(ARCHIVES)}.
+
+{ARCHIVE_LIST}
+
+Return ONLY a valid JSON object where:
+- Each key is the topic exactly as given
+- Each value is one of: {", ".join(ARCHIVES)}
+
+Example:
+{{
+    "graph neural networks for traffic prediction": "arXiv",
+    "randomized controlled trial of a new antihypertensive drug": "PubMed"
+}}""",
+    user="Topics:\n{topics}",
+)
+
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("SingleFlight")
+
+
+class FlightAbandoned(RuntimeError):
+    """The caller that claimed a key stopped before producing a result and nobody was waiting to take over."""
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one upstream request.
+
+    The first caller for a key starts the work as a task; callers that arrive
+    while it is in flight await the same task and receive the same result (or
+    exception). The task is shielded, so a cancelled caller does not cancel
+    the request for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._waiters: dict[str, int] = {}
+        self._handoff_tasks: set[asyncio.Task] = set()
+
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self.handoffs = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+            logger.debug("Joined in-flight request for %s (%d waiting).", key, self._waiters[key])
+
+        return await asyncio.shield(task)
+
+    def claim(self, key: str) -> asyncio.Future | None:
+        """
+        Register the caller as the producer for `key` without handing over a coroutine.
+
+        Returns a future the caller must resolve (result or exception) when
+        its work ends, or hand back with `abandon()` if it stops early; None
+        if another call for `key` is already in flight and the caller should
+        `do()` to join it instead.
+        """
+        if key in self._inflight:
+            return None
+
+        self.calls += 1
+        self.leaders += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._waiters[key] = 0
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def abandon(self, key: str, future: asyncio.Future, fn: Callable[[], Awaitable]):
+        """
+        Hand back a claimed `future` whose producer stopped early (e.g. its client disconnected).
+
+        Callers that joined through `do()` must not inherit the producer's
+        cancellation, so when any are waiting `fn()` finishes the work for
+        them in its own task. Otherwise the future fails with FlightAbandoned.
+        """
+        if future.done():
+            return
+        if not self._waiters.get(key):
+            future.set_exception(FlightAbandoned(f"Request for {key} was abandoned."))
+            return
+
+        self.handoffs += 1
+        logger.info("Producer for %s stopped; finishing the request for %d waiting callers.", key, self._waiters[key])
+        task = asyncio.ensure_future(fn())
+        self._handoff_tasks.add(task)
+
+        def settle(done: asyncio.Future):
+            self._handoff_tasks.discard(done)
+            if future.done():
+                return
+            if done.cancelled():
+                future.set_exception(FlightAbandoned(f"Request for {key} was cancelled."))
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+        task.add_done_callback(settle)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; callers that awaited it already saw it
+        waiters = self._waiters.pop(key, 0)
+        if waiters:
+            logger.info("Shared one upstream response with %d extra callers for %s.", waiters, key)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_requests": self.leaders,
+            "coalesced": self.coalesced,
+            "max_waiters": self.max_waiters,
+            "handoffs": self.handoffs,
+            "in_flight": len(self._inflight),
+            "waiting": sum(self._waiters.values()),
+        }
+
+
+metadata_flights = SingleFlight()
@@ -0,0 +1,66 @@
+import json
+from archive_classifier import ArchiveClassifier
+
+
+class EchoRouter:
+    """Classifies every topic it is asked about as arXiv, except those in `unknown`, and records each chunk."""
+
+    def __init__(self, unknown: set[str] = frozenset()):
+        self.unknown = unknown
+        self.chunks = []
+
+    def complete(self, build) -> str:
+        payload = build("test/model")
+        topics = [line[2:] for line in payload["messages"][-1]["content"].splitlines() if line.startswith("- ")]
+        self.chunks.append(topics)
+        return json.dumps({topic: "arXiv" for topic in topics if topic not in self.unknown})
+
+
+def classifier(router=None, **kwargs) -> ArchiveClassifier:
+    return ArchiveClassifier(router=router or EchoRouter(), mode="llm", **kwargs)
+
+
+def test_chunk_respects_prompt_budget_and_keeps_order():
+    topics = [f"topic {i:02d}" for i in range(10)]
+    chunks = classifier(chunk_tokens=9).chunk(topics)
+
+    assert [topic for chunk in chunks for topic in chunk] == topics
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+
+
+def test_chunk_respects_answer_budget():
+    # Each short topic costs 2 tokens plus 8 for its answer, so 20 answer tokens fit two per chunk.
+    chunks = classifier(chunk_tokens=400, max_tokens=25).chunk(["abc", "def", "ghi", "jkl", "mno"])
+    assert chunks == [["abc", "def"], ["ghi", "jkl"], ["mno"]]
+
+
+def test_chunk_never_drops_an_oversized_topic():
+    long = "x" * 400
+    assert classifier(chunk_tokens=10).chunk(["a", long, "b"]) == [["a"], [long], ["b"]]
+
+
+def test_merge_fans_answers_out_to_every_spelling():
+    groups = ArchiveClassifier.dedupe(["Quantum Computing", "quantum computing.", "CRISPR", "Zebrafish"])
+    assert groups == {
+        "quantum computing": ["Quantum Computing", "quantum computing."],
+        "crispr": ["CRISPR"],
+        "zebrafish": ["Zebrafish"],
+    }
+
+    result = classifier()._merge(groups, [{"quantum computing": "arXiv"}, {"crispr": "bioRxiv"}, {}])
+    assert result.archives == {
+        "Quantum Computing": "arXiv",
+        "quantum computing.": "arXiv",
+        "CRISPR": "bioRxiv",
+    }
+    assert result.failed == ["Zebrafish"]
+
+
+def test_run_sends_each_unique_topic_once_and_reports_failures():
+    router = EchoRouter(unknown={"gibberish"})
+    result = classifier(router, chunk_tokens=4).run("Dark Matter, dark matter, gibberish, Protein Folding")
+
+    sent = [topic for chunk in router.chunks for topic in chunk]
+    assert sorted(sent) == ["Dark Matter", "Protein Folding", "gibberish"]
+    assert result.archives == {"Dark Matter": "arXiv", "dark matter": "arXiv", "Protein Folding": "arXiv"}
+    assert result.failed == ["gibberish"]
@@ -0,0 +1,22 @@
+import pytest
+from json_extract import extract_json
+
+
+def test_skips_citation_markers_before_the_object():
+    assert extract_json('Answer (per [1]): {"archive": "arXiv"}', dict) == {"archive": "arXiv"}
+
+
+def test_tolerates_fences_trailing_commas_and_commentary():
+    text = 'Sure:\n```json\n{"a": [1, 2,], "b": "}",}\n```\nHope that helps [2].'
+    assert extract_json(text, dict) == {"a": [1, 2], "b": "}"}
+
+
+def test_without_kind_returns_first_value():
+    assert extract_json("see [1] then {}") == [1]
+
+
+def test_raises_when_no_value_of_the_kind_exists():
+    with pytest.raises(ValueError):
+        extract_json("only [1] and [2]", dict)
+    with pytest.raises(ValueError):
+        extract_json('cut off {"a": 1', dict)
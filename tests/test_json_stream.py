@@ -0,0 +1,67 @@
+import pytest
+from json_stream import IncrementalJSONParser
+
+ANSWER = (
+    '```json\n{"title": "Dark \\"matter\\", {maybe}", '
+    '"authors": [{"name": "Ada", "tags": ["x", "y"]}, {"name": "Bo"}], '
+    '"year": 2024, "meta": {"open": true, "score": null}}\n```'
+)
+EXPECTED = [
+    ("title", 'Dark "matter", {maybe}'),
+    ("authors", [{"name": "Ada", "tags": ["x", "y"]}, {"name": "Bo"}]),
+    ("year", 2024),
+    ("meta", {"open": True, "score": None}),
+]
+
+
+def feed_all(parser: IncrementalJSONParser, deltas) -> list:
+    return [field for delta in deltas for field in parser.feed(delta)]
+
+
+def test_whole_answer_in_one_delta():
+    parser = IncrementalJSONParser()
+    assert parser.feed(ANSWER) == EXPECTED
+    assert parser.finished
+
+
+@pytest.mark.parametrize("split", range(len(ANSWER) + 1))
+def test_every_split_point_gives_the_same_fields(split):
+    parser = IncrementalJSONParser()
+    assert feed_all(parser, [ANSWER[:split], ANSWER[split:]]) == EXPECTED
+    assert parser.finished
+
+
+def test_one_character_at_a_time():
+    parser = IncrementalJSONParser()
+    assert feed_all(parser, ANSWER) == EXPECTED
+
+
+def test_fields_are_emitted_as_soon_as_they_close():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"title": "A", "authors": [{"name": "Ada"}') == [("title", "A")]
+    assert parser.feed(", {}]") == []
+    assert parser.feed(", ") == [("authors", [{"name": "Ada"}, {}])]
+    assert not parser.finished
+    assert parser.feed('"year": 1999}') == [("year", 1999)]
+    assert parser.finished
+
+
+def test_trailing_commas_are_tolerated():
+    parser = IncrementalJSONParser()
+    text = '{"tags": ["a", "b",], "meta": {"k": 1,}, "year": 2024,}'
+    assert feed_all(parser, text) == [("tags", ["a", "b"]), ("meta", {"k": 1}), ("year", 2024)]
+    assert parser.finished
+
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 1} and {"b": 2}') == [("a", 1)]
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_invalid_value_is_emitted_as_raw_text():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"title": "Unclosed \\q", "year": 20x4}') == [
+        ("title", "Unclosed \\q"),
+        ("year", "20x4"),
+    ]
@@ -0,0 +1,138 @@
+import json
+import asyncio
+from mcp_middleware import MCPMiddleware
+
+
+class StreamingApp:
+    """Streams `chunks` as separate body messages, waiting on `release` before the last one."""
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        for i, chunk in enumerate(self.chunks):
+            if i == len(self.chunks) - 1:
+                await self.release.wait()
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(self.chunks) - 1})
+
+
+def scope(token: str | None = None, authorization: bytes | None = None) -> dict:
+    if token is not None:
+        authorization = f"Bearer {token}".encode()
+    headers = [(b"authorization", authorization)] if authorization is not None else []
+    return {"type": "http", "method": "POST", "path": "/mcp", "headers": headers}
+
+
+async def call(middleware: MCPMiddleware, token: str | None = None, authorization: bytes | None = None) -> list[dict]:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    if isinstance(middleware.app, StreamingApp):
+        middleware.app.release.set()
+    await middleware(scope(token, authorization), receive, send)
+    return sent
+
+
+def status(sent: list[dict]) -> int:
+    return sent[0]["status"]
+
+
+def header(sent: list[dict], name: bytes) -> bytes | None:
+    return dict(sent[0]["headers"]).get(name)
+
+
+def body(sent: list[dict]) -> bytes:
+    return b"".join(message.get("body", b"") for message in sent[1:])
+
+
+def test_missing_or_wrong_key_is_rejected_before_the_app():
+    app = StreamingApp([b"ok"])
+    middleware = MCPMiddleware(app, api_key="secret")
+
+    for token in (None, "wrong", "secretx", ""):
+        sent = asyncio.run(call(middleware, token))
+        assert status(sent) == 401
+        assert json.loads(body(sent))["detail"].startswith("Unauthorized")
+    assert app.calls == 0
+
+
+def test_scheme_is_case_insensitive_and_key_is_not():
+    middleware = MCPMiddleware(StreamingApp([b"ok"]), api_key="secret")
+
+    assert status(asyncio.run(call(middleware, authorization=b"bearer secret"))) == 200
+    assert status(asyncio.run(call(middleware, authorization=b"Bearer SECRET"))) == 401
+    assert status(asyncio.run(call(middleware, authorization=b"Basic secret"))) == 401
+
+
+def test_every_rotated_key_is_accepted():
+    app = StreamingApp([b"ok"])
+    middleware = MCPMiddleware(app, api_key="new", api_keys=["old", "new", ""])
+
+    assert len(middleware.api_keys) == 2
+    assert status(asyncio.run(call(middleware, "new"))) == 200
+    assert status(asyncio.run(call(middleware, "old"))) == 200
+    assert status(asyncio.run(call(middleware, "retired"))) == 401
+    assert app.calls == 2
+
+
+def test_rate_limit_answers_429_with_retry_after_per_key():
+    app = StreamingApp([b"ok"])
+    middleware = MCPMiddleware(app, api_keys=["a", "b"], rate=0.1, burst=2)
+
+    assert [status(asyncio.run(call(middleware, "a"))) for _ in range(3)] == [200, 200, 429]
+    limited = asyncio.run(call(middleware, "a"))
+    assert status(limited) == 429
+    # One token every ten seconds.
+    assert 1 <= int(header(limited, b"retry-after")) <= 10
+    assert "rate limit" in json.loads(body(limited))["detail"]
+
+    # Each key has its own bucket.
+    assert status(asyncio.run(call(middleware, "b"))) == 200
+    assert app.calls == 3
+
+
+def test_streamed_body_is_passed_through_unbuffered():
+    chunks = [b"event: message\ndata: 1\n\n", b"event: message\ndata: 2\n\n", b"event: message\ndata: 3\n\n"]
+
+    async def scenario():
+        app = StreamingApp(chunks)
+        middleware = MCPMiddleware(app, api_key="secret")
+        sent, first_chunks = [], asyncio.Event()
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) == len(chunks):
+                first_chunks.set()
+
+        task = asyncio.create_task(middleware(scope("secret"), None, send))
+        # Everything before the last chunk reaches the client while the app is still streaming.
+        await asyncio.wait_for(first_chunks.wait(), 1)
+        assert not task.done()
+        app.release.set()
+        await task
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert status(sent) == 200
+    assert header(sent, b"content-type") == b"text/event-stream"
+    assert [message["body"] for message in sent[1:]] == chunks
+    assert [message["more_body"] for message in sent[1:]] == [True, True, False]
+
+
+def test_non_http_scopes_skip_auth():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["type"])
+
+    asyncio.run(MCPMiddleware(app, api_key="secret")({"type": "lifespan"}, None, None))
+    assert seen == ["lifespan"]
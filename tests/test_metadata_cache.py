@@ -0,0 +1,83 @@
+import time
+from metadata_cache import MetadataCache, normalize_topic
+
+
+def test_keys_share_near_identical_topics():
+    assert normalize_topic("  Dark   Matter?! ") == "dark matter"
+    assert MetadataCache.make_key("w", "m", "v1", "Dark Matter.") == MetadataCache.make_key("w", "m", "v1", "dark  matter")
+    assert MetadataCache.make_key("w", "m", "v1", "x") != MetadataCache.make_key("w", "m", "v2", "x")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = MetadataCache(ttl=10)
+    cache.set("a", "1")
+
+    now[0] += 9.9
+    assert cache.get("a") == "1"
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = MetadataCache(max_entries=1, path=path)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    # "a" was evicted from memory before its write may have been committed.
+    assert cache.get("a") == "1"
+    cache.flush()
+    assert cache.stats()["pending_writes"] == 0
+    # Reading "a" back evicted "b", which now comes from disk.
+    assert cache.get("b") == "2"
+    assert cache.stats()["disk_hits"] == 1
+
+    reopened = MetadataCache(max_entries=8, path=path)
+    assert reopened.get("a") == "1"
+    assert reopened.get("b") == "2"
+    assert reopened.get("c") is None
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+
+def test_expired_disk_entries_are_dropped_on_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = MetadataCache(ttl=10, path=path)
+    cache.set("old", "1")
+    now[0] += 5
+    cache.set("new", "2")
+    cache.flush()
+
+    now[0] += 7
+    reopened = MetadataCache(ttl=10, path=path)
+    assert reopened.get("old") is None
+    assert reopened.get("new") == "2"
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = MetadataCache(path=path)
+    cache.set("a", "1")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert MetadataCache(path=path).get("a") is None
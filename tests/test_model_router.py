@@ -0,0 +1,103 @@
+import time
+import asyncio
+import pytest
+from model_router import WEB_SEARCH, Backend, BackendStats, ModelRouter
+from resilience import CircuitBreaker, CircuitOpenError
+
+
+class FakeClient:
+    deadline = 30.0
+
+    def __init__(self):
+        self._breaker = CircuitBreaker("fake")
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        return self._breaker
+
+
+def backend(model: str, latency: float | None, last_used: float) -> Backend:
+    stats = BackendStats()
+    stats.latency = latency
+    stats.last_used = last_used
+    return Backend("openrouter", model, FakeClient(), capabilities=frozenset(), stats=stats)
+
+
+def test_stale_backend_is_probed_by_one_call_only():
+    now = time.monotonic()
+    slow, fast = backend("slow", 1.0, now - 10), backend("fast", 0.01, now)
+    router = ModelRouter([slow, fast], probe_interval=1.0)
+    router._last_call = now
+
+    assert router._attempts(())[0] is slow
+    # While the probe is out, everyone else keeps using the fast backend.
+    assert [router._attempts(())[0] for _ in range(5)] == [fast] * 5
+
+    slow.stats.record(1.0, ok=True)
+    assert slow.stats.probe_started == 0.0
+    assert router._attempts(())[0] is fast
+
+
+def test_untried_backend_ranks_last_while_its_probe_is_out():
+    now = time.monotonic()
+    new, known = backend("new", None, 0.0), backend("known", 0.5, now)
+    router = ModelRouter([new, known], probe_interval=30.0)
+    router._last_call = now
+
+    assert router._attempts(())[0] is new
+    assert router._attempts(())[0] is known
+
+
+class ScriptedClient(FakeClient):
+    """Answers with its model name after `delay` seconds, recording the payloads it was sent."""
+
+    def __init__(self, delay: float, hedge_delay: float = 0.05):
+        super().__init__()
+        self.delay = delay
+        self._hedge_delay = hedge_delay
+        self.payloads = []
+
+    def hedge_delay(self, model: str) -> float:
+        return self._hedge_delay
+
+    async def acomplete(self, payload: dict, deadline=None, hedge: bool = True) -> str:
+        assert hedge is False
+        self.payloads.append(payload)
+        self.breaker(payload["model"]).check()
+        await asyncio.sleep(self.delay)
+        return payload["model"]
+
+
+def scripted(model: str, client: ScriptedClient, capabilities=frozenset({WEB_SEARCH}), **kwargs) -> Backend:
+    return Backend("openrouter", model, client, capabilities=capabilities, **kwargs)
+
+
+def test_hedges_to_next_capable_backend_with_its_own_payload():
+    slow, fast = ScriptedClient(1.0), ScriptedClient(0.01)
+    primary, hedge = scripted("sonar", slow, weight=10), scripted("sonar-online", fast)
+    router = ModelRouter([primary, hedge], hedge=True)
+    for backend in (primary, hedge):
+        backend.stats.record(0.5, ok=True)
+    router._last_call = time.monotonic()
+
+    answer = asyncio.run(router.acomplete(lambda model: {"model": model}, (WEB_SEARCH,)))
+
+    assert answer == "sonar-online"
+    assert fast.payloads == [{"model": "sonar-online"}]
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+    # The cancelled primary gets no verdict; the hedge that answered gets the credit.
+    assert (primary.stats.calls, hedge.stats.calls) == (1, 2)
+
+
+def test_never_hedges_to_a_backend_without_the_required_capability():
+    sonar = ScriptedClient(0.01)
+    for _ in range(sonar.breaker("sonar").failure_threshold):
+        sonar.breaker("sonar").record_failure()
+    mini = ScriptedClient(0.01)
+    router = ModelRouter(
+        [scripted("sonar", sonar), scripted("gpt-4o-mini", mini, capabilities=frozenset(), fallback_only=True)],
+        hedge=True,
+    )
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(router.acomplete(lambda model: {"model": model}, (WEB_SEARCH,)))
+    assert mini.payloads == []
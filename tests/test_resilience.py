@@ -0,0 +1,123 @@
+import time
+import asyncio
+import httpx
+import pytest
+import requests
+from openrouter_client import OpenRouterClient
+from resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, OpenRouterError, RetryPolicy
+
+MODEL = "test/model"
+
+
+def open_breaker(client: OpenRouterClient) -> CircuitBreaker:
+    """Trip `MODEL`'s breaker with a reset timeout of zero, so it is half-open straight away."""
+    breaker = client.breaker(MODEL)
+    breaker.failure_threshold = 1
+    breaker.reset_timeout = 0.0
+    breaker.record_failure()
+    return breaker
+
+
+def make_client() -> OpenRouterClient:
+    return OpenRouterClient("test-key", api_url="http://upstream.test/chat", retry_policy=RetryPolicy(max_attempts=1))
+
+
+def test_half_open_admits_one_trial_until_released():
+    breaker = CircuitBreaker(MODEL, failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    assert breaker.check() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.release_trial()
+    assert breaker.check() is True
+
+
+def test_closed_breaker_does_not_hand_out_trials():
+    breaker = CircuitBreaker(MODEL)
+    assert breaker.check() is False
+    assert breaker.check() is False
+
+
+def test_client_error_trial_releases_breaker(monkeypatch):
+    client = make_client()
+    breaker = open_breaker(client)
+
+    response = requests.Response()
+    response.status_code = 400
+    response._content = b'{"error": "bad request"}'
+    monkeypatch.setattr(client._session, "post", lambda *args, **kwargs: response)
+
+    with pytest.raises(OpenRouterError):
+        client.complete({"model": MODEL, "messages": []})
+
+    # A 4xx says nothing about the upstream's health, so the next call may trial again.
+    assert breaker.state == "half_open"
+    assert breaker.check() is True
+
+
+def test_cancelled_trial_releases_breaker():
+    client = make_client()
+    breaker = open_breaker(client)
+
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    async def main():
+        client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(hang))
+        client._async_loop = asyncio.get_running_loop()
+        client._async_slots = asyncio.Semaphore(1)
+
+        call = asyncio.ensure_future(client.acomplete({"model": MODEL, "messages": []}))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await client.aclose()
+
+    asyncio.run(main())
+    assert breaker.check() is True
+
+
+class DripStream(httpx.AsyncByteStream):
+    """A body that never finishes: one byte every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    async def __aiter__(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            yield b" "
+
+
+def drip_client(interval: float) -> OpenRouterClient:
+    client = OpenRouterClient(
+        "test-key", api_url="http://upstream.test/chat", attempt_timeout=1.0, retry_policy=RetryPolicy(max_attempts=3)
+    )
+    client._async_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=DripStream(interval)))
+    )
+    client._async_loop = asyncio.get_running_loop()
+    client._async_slots = asyncio.Semaphore(1)
+    return client
+
+
+@pytest.mark.parametrize("method", ["acomplete", "astream"])
+def test_deadline_bounds_a_dripping_upstream(method):
+    async def main():
+        client = drip_client(0.1)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            if method == "acomplete":
+                await client.acomplete({"model": MODEL, "messages": []}, deadline=Deadline(0.5))
+            else:
+                async for _ in client.astream({"model": MODEL, "messages": []}, deadline=Deadline(0.5)):
+                    pass
+        elapsed = time.monotonic() - started
+        await client.aclose()
+        return elapsed
+
+    assert asyncio.run(main()) < 0.8
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from single_flight import FlightAbandoned, SingleFlight
+
+
+async def fetch():
+    await asyncio.sleep(0.05)
+    return "fetched"
+
+
+async def claim_and_hang(flights: SingleFlight, key: str):
+    flight = flights.claim(key)
+    try:
+        await asyncio.sleep(60)
+    finally:
+        flights.abandon(key, flight, fetch)
+
+
+def test_cancelled_producer_hands_off_to_joined_callers():
+    async def main():
+        flights = SingleFlight()
+        producer = asyncio.ensure_future(claim_and_hang(flights, "k"))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        producer.cancel()
+        return await joiner, flights.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == "fetched"
+    assert stats["handoffs"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_abandoned_claim_without_waiters_fails_quietly():
+    async def main():
+        flights = SingleFlight()
+        flight = flights.claim("k")
+        flights.abandon("k", flight, fetch)
+        await asyncio.sleep(0)
+        return flight, flights.stats()
+
+    flight, stats = asyncio.run(main())
+    with pytest.raises(FlightAbandoned):
+        flight.result()
+    assert stats["handoffs"] == 0
+    assert stats["in_flight"] == 0
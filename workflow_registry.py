@@ -0,0 +1,76 @@
+import logging
+import importlib
+import threading
+from typing import Callable
+from config import Settings, get_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("WorkflowRegistry")
+
+
+class WorkflowRegistry:
+    """
+    Name -> workflow instance, built on first use.
+
+    Registering a workflow records only its module and class name, so neither
+    the module (and its dependencies) nor the client are loaded until `get()`
+    is first called for that name.
+    """
+
+    def __init__(self):
+        self._specs: dict[str, tuple[str, str, Callable[[], dict]]] = {}
+        self._instances: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, module: str, class_name: str, kwargs: Callable[[], dict] = dict):
+        self._specs[name] = (module, class_name, kwargs)
+
+    def names(self) -> list[str]:
+        return list(self._specs)
+
+    def loaded(self) -> list[str]:
+        return list(self._instances)
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self._specs:
+            raise KeyError(f"Workflow {name!r} is not enabled; registered: {', '.join(self._specs)}.")
+
+        with self._lock:
+            if name not in self._instances:
+                module, class_name, kwargs = self._specs[name]
+                cls = getattr(importlib.import_module(module), class_name)
+                self._instances[name] = cls(**kwargs())
+                logger.info("Workflow %s (%s.%s) loaded.", name, module, class_name)
+        return self._instances[name]
+
+
+def _local_classifier() -> dict:
+    local_archive_classifier = importlib.import_module("local_archive_classifier")
+    return {"local_classifier": local_archive_classifier.get_local_archive_classifier()}
+
+
+def build_registry(settings: Settings | None = None) -> WorkflowRegistry:
+    """
+    Register the built-in workflows plus whichever optional providers METADATA_PROVIDERS enables.
+
+    The metadata workflows only get the local classifier's archive hint with
+    METADATA_ARCHIVE_HINT=true, since a confident hint overrides the model's
+    own choice of archive.
+    """
+    settings = settings or get_settings()
+    registry = WorkflowRegistry()
+    hint = _local_classifier if settings.metadata_archive_hint else dict
+    registry.register("openrouter", "openrouter_metadata_workflow", "OpenRouterMetadataWorkflow", hint)
+    registry.register("openrouter_v2", "openrouter_metadata_workflow_v2", "OpenRouterMetadataWorkflowV2", hint)
+    registry.register("archive_classifier", "archive_classifier", "ArchiveClassifier", _local_classifier)
+    if "perplexity" in settings.metadata_providers:
+        registry.register("perplexity", "perplexity_metadata_workflow", "PerplexityMetadataWorkflow")
+    return registry